@@ -169,6 +169,13 @@ CLOUDINARY_STORAGE = {
 
 DEFAULT_FILE_STORAGE = 'cloudinary_storage.storage.MediaCloudinaryStorage'
 
+# Local development/testing without Cloudinary: store media (e.g. evidence
+# thumbnails) on disk instead
+MEDIA_URL = '/media/'
+MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+if os.environ.get('LOCAL_MEDIA_STORAGE') == 'True':
+    DEFAULT_FILE_STORAGE = 'django.core.files.storage.FileSystemStorage'
+
 # Redirect to home/dashboard after successful login
 LOGIN_REDIRECT_URL = 'dashboard'
 # Redirect to login page after logout
@@ -206,6 +213,58 @@ CSRF_COOKIE_HTTPONLY = True
 # (This ensures the dashboard always reloads fresh from the server)
 CACHE_MIDDLEWARE_SECONDS = 0
 
+# 4b. PUBLIC CLIENT PAGES: Rendered fragments are cached server-side, keyed on
+# the project's content_version, so this only bounds how long unused versions linger
+CLIENT_PAGE_CACHE_TIMEOUT = int(os.environ.get('CLIENT_PAGE_CACHE_TIMEOUT', 24 * 60 * 60))
+
+# 4c. EVIDENCE UPLOADS: When True, uploads are queued and watermarked/uploaded by
+# `python manage.py run_evidence_worker`, which must then run as its own process;
+# when False (the default) each upload is processed once its request commits
+EVIDENCE_ASYNC_PROCESSING = os.environ.get('EVIDENCE_ASYNC_PROCESSING', 'False') == 'True'
+EVIDENCE_JOB_MAX_ATTEMPTS = 3
+
+# 4d. REVERSE GEOCODING: Coordinates are rounded to this many decimals before
+# lookup/caching (4 decimals ~ 11 m); Nominatim allows at most 1 request/second
+GEOCODE_PRECISION = int(os.environ.get('GEOCODE_PRECISION', 4))
+GEOCODE_LRU_SIZE = 2048
+GEOCODE_MIN_INTERVAL = 1.0
+
+# 4e. WATERMARKED PHOTOS: Optional downscale of the longest side (0 = keep full
+# resolution) and JPEG encoder settings. Subsampling: 0 = 4:4:4, 1 = 4:2:2,
+# 2 = 4:2:0, unset = Pillow's default for the chosen quality.
+WATERMARK_MAX_DIMENSION = int(os.environ.get('WATERMARK_MAX_DIMENSION', 0))
+WATERMARK_JPEG_QUALITY = int(os.environ.get('WATERMARK_JPEG_QUALITY', 95))
+WATERMARK_JPEG_PROGRESSIVE = os.environ.get('WATERMARK_JPEG_PROGRESSIVE', 'False') == 'True'
+WATERMARK_JPEG_SUBSAMPLING = int(os.environ['WATERMARK_JPEG_SUBSAMPLING']) if os.environ.get('WATERMARK_JPEG_SUBSAMPLING') else None
+
+# 4f. EVIDENCE DERIVATIVES: Longest side in pixels of the copies generated for
+# each watermarked photo; pages load these instead of the full original
+EVIDENCE_DERIVATIVE_SIZES = {'thumbnail': 320, 'medium': 1280}
+
+# 4g. PROJECT DATA FILES: Seconds parsed headers/dropdown values stay in the
+# cache in front of the DataFileIndex tables (entries are keyed on the file
+# name, so a new upload never reads stale values)
+DATA_FILE_CACHE_TIMEOUT = 60 * 60
+
+# 4h. DROPDOWN TYPEAHEAD: DROPDOWN fields with more distinct values than this
+# render as a search box backed by the typeahead endpoint instead of a <select>
+DROPDOWN_TYPEAHEAD_THRESHOLD = int(os.environ.get('DROPDOWN_TYPEAHEAD_THRESHOLD', 200))
+DROPDOWN_TYPEAHEAD_LIMIT = 20
+
+# 4i. AUDIT LOG: log_action entries are buffered per process and written in one
+# bulk_create when AUDIT_FLUSH_SIZE are waiting or every AUDIT_FLUSH_INTERVAL
+# seconds (see tracker/audit.py); AUDIT_BUFFER_LIMIT caps entries held back
+# while the database is unavailable. AUDIT_BUFFERED=False writes each one inline.
+AUDIT_BUFFERED = os.environ.get('AUDIT_BUFFERED', 'True') == 'True'
+AUDIT_FLUSH_SIZE = 100
+AUDIT_FLUSH_INTERVAL = 2.0
+AUDIT_BUFFER_LIMIT = 10_000
+
+# 4j. LOG ARCHIVAL: `manage.py archive_project_logs` moves ProjectLog rows older
+# than this many days into compressed archives (tracker/archive.py)
+LOG_RETENTION_DAYS = int(os.environ.get('LOG_RETENTION_DAYS', 365))
+LOG_ARCHIVE_MAX_ROWS = 100_000
+
 # 5. STRICT BROWSER RULES
 SECURE_BROWSER_XSS_FILTER = True
 SECURE_CONTENT_TYPE_NOSNIFF = True
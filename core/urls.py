@@ -15,6 +15,8 @@ Including another URLconf
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
 
+from django.conf import settings
+from django.conf.urls.static import static
 from django.contrib import admin
 from django.urls import path, include  # <-- Make sure 'include' is here
 
@@ -23,5 +25,8 @@ urlpatterns = [
     path('', include('tracker.urls')), # <-- This points to your app
 ]
 
+# Serves LOCAL_MEDIA_STORAGE files in development (no-op when DEBUG is off)
+urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+
 
 
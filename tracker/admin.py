@@ -1,8 +1,11 @@
-from django.contrib import admin
+from django.contrib import admin, messages
 from django.contrib.auth.admin import UserAdmin
 from .models import User, ProjectType, StageDefinition, Project, Pole, Evidence, ItemFieldDefinition, ItemFieldValue, Client
 from .forms import ItemFieldDefinitionForm 
-from .models import ProjectIssue
+from .importer import format_report, import_poles
+from .utils import build_data_file_index, get_data_file_index, index_data_file_columns
+from .models import ProjectIssue, EvidenceJob, ProjectLogArchive
+from .views import log_action
 
 class CustomUserAdmin(UserAdmin):
     model = User
@@ -38,10 +41,11 @@ class ItemFieldDefinitionInline(admin.TabularInline):
 
 @admin.register(Project)
 class ProjectAdmin(admin.ModelAdmin):
-    list_display = ('name', 'client', 'project_type', 'status')
+    list_display = ('name', 'client', 'project_type', 'status', 'pole_total', 'progress', 'has_open_issues')
     list_filter = ('client', 'status', 'project_type')
     filter_horizontal = ('contractors',) 
     inlines = [ItemFieldDefinitionInline]
+    actions = ['import_poles_preview', 'import_poles_from_file']
     
     fieldsets = (
         (None, {'fields': ('name', 'client', 'project_type', 'status')}),
@@ -49,6 +53,49 @@ class ProjectAdmin(admin.ModelAdmin):
         ('Data Source', {'fields': ('data_file',)}),
     )
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).with_stats()
+
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        # Parse a newly uploaded data file now rather than on the first form that needs it
+        if 'data_file' in form.changed_data:
+            if obj.data_file: build_data_file_index(obj)
+            else: obj.data_file_indexes.all().delete()
+
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        # Index columns picked by new or edited DROPDOWN fields up front
+        index = get_data_file_index(form.instance)
+        if index: index_data_file_columns(form.instance, index)
+
+    @admin.action(description="Preview pole import from data file")
+    def import_poles_preview(self, request, queryset):
+        self._run_import(request, queryset, dry_run=True)
+
+    @admin.action(description="Import poles from data file")
+    def import_poles_from_file(self, request, queryset):
+        self._run_import(request, queryset, dry_run=False)
+
+    def _run_import(self, request, queryset, dry_run):
+        for project in queryset.exclude(data_file='').exclude(data_file__isnull=True):
+            report = import_poles(project, dry_run=dry_run)
+            if report['created'] and not dry_run:
+                log_action(
+                    project, request.user, "Imported Items", "Data File", f"{report['created']} items from {project.data_file.name}",
+                    data={'created': report['created'], 'file': project.data_file.name},
+                )
+            self.message_user(request, f"{project.name}: {format_report(report)}", messages.SUCCESS)
+
+    @admin.display(description='Poles', ordering='pole_total')
+    def pole_total(self, obj): return obj.pole_total
+
+    @admin.display(description='Progress', ordering='progress')
+    def progress(self, obj): return f"{obj.progress}%"
+
+    @admin.display(description='Open Issues', boolean=True, ordering='open_issue_flag')
+    def has_open_issues(self, obj): return obj.open_issue_flag
+
 # Add this to admin.py
 
 @admin.register(ProjectIssue)
@@ -59,6 +106,28 @@ class ProjectIssueAdmin(admin.ModelAdmin):
 
     def mark_resolved(self, request, queryset):
         queryset.update(status='RESOLVED')
+        # The queryset update skips the signals that invalidate the client pages
+        Project.objects.filter(poles__issues__in=queryset).bump_content_version()
+
+@admin.register(EvidenceJob)
+class EvidenceJobAdmin(admin.ModelAdmin):
+    list_display = ('evidence', 'status', 'attempts', 'created_at', 'finished_at')
+    list_filter = ('status',)
+    readonly_fields = ('evidence', 'file_name', 'attempts', 'last_error', 'created_at', 'started_at', 'finished_at')
+    exclude = ('raw_image',)
+    actions = ['retry_jobs']
+
+    def retry_jobs(self, request, queryset):
+        queryset.exclude(status='DONE').update(status='PENDING', attempts=0)
+
+@admin.register(ProjectLogArchive)
+class ProjectLogArchiveAdmin(admin.ModelAdmin):
+    # Written only by `manage.py archive_project_logs`
+    list_display = ('project', 'oldest_at', 'newest_at', 'row_count', 'created_at')
+    list_filter = ('project',)
+    readonly_fields = ('project', 'file', 'oldest_at', 'newest_at', 'row_count', 'created_at')
+
+    def has_add_permission(self, request): return False
 
 admin.site.register(Pole)
 admin.site.register(Evidence)
@@ -0,0 +1,101 @@
+import gzip
+import json
+import logging
+import tempfile
+from datetime import datetime
+from django.conf import settings
+from django.core.files import File
+from django.db import transaction
+from .models import ProjectLog, ProjectLogArchive, log_date_bounds
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_BATCH_SIZE = 2000
+ARCHIVE_FIELDS = ('id', 'timestamp', 'user_id', 'user__username', 'action', 'target', 'details', 'gps_lat', 'gps_long', 'payload')
+
+
+# ==========================================
+# 1. MOVING LOG ROWS INTO ARCHIVES
+# ==========================================
+# Old entries are written newest first to gzip-compressed JSON lines, one
+# ProjectLogArchive per block of LOG_ARCHIVE_MAX_ROWS, and then deleted from
+# ProjectLog in the same transaction that records the archive. A failed run
+# leaves at worst an unreferenced file in storage, never a missing or
+# duplicated entry.
+def archive_project_logs(project, before=None, max_rows=None, dry_run=False):
+    """
+    Moves the project's log entries older than `before` (all of them when None)
+    into archives. Returns (archives written, entries moved); with dry_run,
+    nothing is written and the count is what would be moved.
+    """
+    logs = project.logs.all()
+    if before is not None:
+        logs = logs.filter(timestamp__lt=before)
+    if dry_run:
+        return 0, logs.count()
+
+    max_rows = max_rows or settings.LOG_ARCHIVE_MAX_ROWS
+    archives = moved = 0
+    while True:
+        archive, ids = _write_archive(project, logs.values_list(*ARCHIVE_FIELDS)[:max_rows])
+        if archive is None:
+            return archives, moved
+        with transaction.atomic():
+            archive.save()
+            for i in range(0, len(ids), ARCHIVE_BATCH_SIZE):
+                ProjectLog.objects.filter(pk__in=ids[i:i + ARCHIVE_BATCH_SIZE]).delete()
+        logger.info(f"Archived {len(ids)} log entries of project {project.pk} to {archive.file.name}")
+        archives += 1
+        moved += len(ids)
+
+def _write_archive(project, rows):
+    # Streams `rows` (newest first) into a compressed file and returns the unsaved
+    # archive with the ids it holds, or (None, []) when there is nothing to move
+    ids = []
+    newest_at = oldest_at = None
+    with tempfile.TemporaryFile() as raw:
+        with gzip.GzipFile(fileobj=raw, mode='wb') as compressed:
+            for log_id, timestamp, user_id, username, action, target, details, gps_lat, gps_long, payload in rows.iterator(chunk_size=ARCHIVE_BATCH_SIZE):
+                compressed.write((json.dumps({
+                    'id': log_id, 'timestamp': timestamp.isoformat(), 'user_id': user_id, 'user': username,
+                    'action': action, 'target': target, 'details': details,
+                    'gps_lat': gps_lat, 'gps_long': gps_long, 'payload': payload,
+                }, ensure_ascii=False) + '\n').encode('utf-8'))
+                ids.append(log_id)
+                newest_at = newest_at or timestamp
+                oldest_at = timestamp
+        if not ids:
+            return None, []
+
+        raw.seek(0)
+        archive = ProjectLogArchive(project=project, oldest_at=oldest_at, newest_at=newest_at, row_count=len(ids))
+        archive.file.save(
+            f"project_{project.pk}_{oldest_at:%Y%m%d%H%M%S}_{newest_at:%Y%m%d%H%M%S}.jsonl.gz", File(raw), save=False
+        )
+    return archive, ids
+
+
+# ==========================================
+# 2. READING ARCHIVED ENTRIES
+# ==========================================
+def iter_archived_logs(project, start=None, end=None, action='', user_id=None, system_only=False, stage_id=None, pole_id=None):
+    """
+    Archived entries of `project`, newest first, as dicts shaped like the
+    archive lines (with 'timestamp' parsed back to a datetime). Takes the
+    ProjectLogQuerySet.matching filters; archives outside the date range are
+    never downloaded.
+    """
+    start_at, end_at = log_date_bounds(start, end)
+    for archive in project.log_archives.overlapping(start, end):
+        with archive.file.open('rb') as stored, gzip.open(stored, 'rt', encoding='utf-8') as lines:
+            for line in lines:
+                row = json.loads(line)
+                row['timestamp'] = datetime.fromisoformat(row['timestamp'])
+                if end_at and row['timestamp'] >= end_at: continue
+                if start_at and row['timestamp'] < start_at: break
+                if action and row['action'] != action: continue
+                if system_only and row['user_id'] is not None: continue
+                if not system_only and user_id is not None and row['user_id'] != user_id: continue
+                if stage_id is not None and row['payload'].get('stage_id') != stage_id: continue
+                if pole_id is not None and row['payload'].get('pole_id') != pole_id: continue
+                yield row
@@ -0,0 +1,126 @@
+import atexit
+import logging
+import os
+import threading
+import time
+from django.conf import settings
+from django.db import close_old_connections, connection
+from .models import ProjectLog
+
+logger = logging.getLogger(__name__)
+
+
+# ==========================================
+# 1. BUFFERED AUDIT SINK
+# ==========================================
+# log_action used to INSERT one ProjectLog row inside every mutating request.
+# Entries now go to a per-process buffer that a background thread writes with
+# one bulk_create when AUDIT_FLUSH_SIZE entries are waiting or
+# AUDIT_FLUSH_INTERVAL seconds have passed. The buffer is flushed at exit, so a
+# graceful shutdown (SIGTERM to a gunicorn worker, end of a management command)
+# loses nothing; a hard kill loses at most one interval of entries.
+class AuditBuffer:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        # Held for a whole flush, so the exit flush waits for one in progress
+        self._flushing = threading.Lock()
+        self._pending = []
+        self._thread = None
+        self._pid = None
+        self._stats = {
+            'queued': 0, 'written': 0, 'dropped': 0, 'flushes': 0, 'failures': 0,
+            'flush_seconds': 0.0, 'max_flush_seconds': 0.0, 'max_batch': 0,
+        }
+
+    def add(self, entry):
+        """Queues an unsaved ProjectLog; the background writer saves it."""
+        with self._lock:
+            self._ensure_writer()
+            self._pending.append(entry)
+            self._stats['queued'] += 1
+            if len(self._pending) >= settings.AUDIT_FLUSH_SIZE:
+                self._wakeup.notify()
+
+    def flush(self):
+        """Writes everything queued so far and returns the number of rows written."""
+        with self._flushing:
+            return self._flush()
+
+    def _flush(self):
+        with self._lock:
+            batch, self._pending = self._pending, []
+        if not batch:
+            return 0
+
+        started = time.perf_counter()
+        try:
+            ProjectLog.objects.bulk_create(batch)
+        except Exception:
+            logger.error(f"AUDIT LOG FAILURE: Could not write {len(batch)} buffered log entries.", exc_info=True)
+            with self._lock:
+                self._stats['failures'] += 1
+                # Keep them for the next flush unless the buffer is backing up
+                room = settings.AUDIT_BUFFER_LIMIT - len(self._pending)
+                kept = batch[-room:] if room > 0 else []
+                self._pending[:0] = kept
+                self._stats['dropped'] += len(batch) - len(kept)
+            return 0
+
+        elapsed = time.perf_counter() - started
+        with self._lock:
+            self._stats['written'] += len(batch)
+            self._stats['flushes'] += 1
+            self._stats['flush_seconds'] += elapsed
+            self._stats['max_flush_seconds'] = max(self._stats['max_flush_seconds'], elapsed)
+            self._stats['max_batch'] = max(self._stats['max_batch'], len(batch))
+        logger.debug(f"Audit buffer flushed {len(batch)} entries in {elapsed * 1000:.1f} ms")
+        return len(batch)
+
+    def stats(self):
+        """Counters since process start, plus the current backlog and mean flush time."""
+        with self._lock:
+            stats = dict(self._stats, pending=len(self._pending))
+        stats['mean_flush_seconds'] = stats['flush_seconds'] / stats['flushes'] if stats['flushes'] else 0.0
+        return stats
+
+    def _ensure_writer(self):
+        # Called with the lock held. A forked worker (gunicorn --preload) inherits
+        # the buffer but not the thread, so the writer is (re)started per process.
+        if self._pid == os.getpid() and self._thread.is_alive():
+            return
+        if self._pid != os.getpid():
+            self._pending = []
+        self._pid = os.getpid()
+        self._thread = threading.Thread(target=self._run, name='audit-writer', daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            with self._lock:
+                if len(self._pending) < settings.AUDIT_FLUSH_SIZE:
+                    self._wakeup.wait(settings.AUDIT_FLUSH_INTERVAL)
+            close_old_connections()
+            self.flush()
+
+
+buffer = AuditBuffer()
+
+@atexit.register
+def _flush_at_exit():
+    if buffer.flush():
+        connection.close()
+
+def record(entry):
+    """
+    Stores an unsaved ProjectLog: buffered when AUDIT_BUFFERED is on, otherwise
+    saved immediately.
+    """
+    if settings.AUDIT_BUFFERED:
+        buffer.add(entry)
+        return
+    try:
+        entry.save()
+    except Exception:
+        # Runs as an on_commit callback, so a failure must not reach the request
+        logger.error("AUDIT LOG FAILURE: Could not save log entry.", exc_info=True)
@@ -1,6 +1,9 @@
 from django import forms
+from django.conf import settings
+from django.urls import reverse
+from django.utils.html import format_html
 from .models import Evidence, ItemFieldDefinition
-from .utils import get_dropdown_options, get_file_headers
+from .utils import get_dropdown_values, get_file_headers, is_dropdown_value
 
 class EvidenceForm(forms.ModelForm):
     class Meta:
@@ -11,16 +14,43 @@ class EvidenceForm(forms.ModelForm):
             'gps_long': forms.HiddenInput(),
         }
 
+class TypeaheadInput(forms.TextInput):
+    """Text input with a <datalist> that add_item.html fills from the typeahead endpoint."""
+    def render(self, name, value, attrs=None, renderer=None):
+        list_id = f"{(attrs or {}).get('id') or name}_options"
+        html = super().render(name, value, {**(attrs or {}), 'list': list_id}, renderer)
+        return format_html('{}<datalist id="{}"></datalist>', html, list_id)
+
 class DynamicItemForm(forms.Form):
     def __init__(self, project, *args, **kwargs):
         super().__init__(*args, **kwargs)
-        for field_def in project.field_definitions.all():
+        self.project = project
+        self.typeahead_columns = {}
+        self.field_defs = list(project.field_definitions.all())
+        for field_def in self.field_defs:
             field_name = f"custom_{field_def.id}"
             if field_def.field_type == 'TEXT':
                 self.fields[field_name] = forms.CharField(label=field_def.label, required=True, widget=forms.TextInput(attrs={'class': 'form-control'}))
             elif field_def.field_type == 'DROPDOWN':
-                choices = [('', '-- Select --')] + get_dropdown_options(project.data_file, field_def.excel_column)
-                self.fields[field_name] = forms.ChoiceField(label=field_def.label, choices=choices, required=True, widget=forms.Select(attrs={'class': 'form-select'}))
+                values = get_dropdown_values(project, field_def.excel_column)
+                if len(values) > settings.DROPDOWN_TYPEAHEAD_THRESHOLD:
+                    # Too many values for a <select>: search them server-side instead
+                    self.typeahead_columns[field_name] = field_def.excel_column
+                    self.fields[field_name] = forms.CharField(label=field_def.label, required=True, widget=TypeaheadInput(attrs={
+                        'class': 'form-control', 'autocomplete': 'off', 'placeholder': 'Start typing to search...',
+                        'data-typeahead-url': reverse('dropdown_typeahead', args=[project.id, field_def.id]),
+                    }))
+                else:
+                    choices = [('', '-- Select --')] + [(o, o) for o in values]
+                    self.fields[field_name] = forms.ChoiceField(label=field_def.label, choices=choices, required=True, widget=forms.Select(attrs={'class': 'form-select'}))
+
+    def clean(self):
+        cleaned_data = super().clean()
+        for field_name, column in self.typeahead_columns.items():
+            value = cleaned_data.get(field_name)
+            if value and not is_dropdown_value(self.project, column, value):
+                self.add_error(field_name, "Select a value from the suggestions.")
+        return cleaned_data
 
 class ItemFieldDefinitionForm(forms.ModelForm):
     excel_column = forms.ChoiceField(required=False)
@@ -39,7 +69,7 @@ class ItemFieldDefinitionForm(forms.ModelForm):
             project = self.parent_project
 
         if project and project.data_file:
-            headers = get_file_headers(project.data_file)
+            headers = get_file_headers(project)
             if headers:
                 self.fields['excel_column'].choices = [('', '-- Select Column --')] + [(h, h) for h in headers]
             else:
@@ -0,0 +1,103 @@
+from collections import Counter
+from django.db import transaction
+from .models import Project, Pole, PoleSearchDocument, PoleSequence, ItemFieldValue
+from .utils import get_file_headers, iter_data_file_columns
+
+IMPORT_BATCH_SIZE = 1000
+SAMPLE_SIZE = 5
+
+
+# ==========================================
+# 1. POLE IMPORT FROM THE PROJECT DATA FILE
+# ==========================================
+# Every data file row becomes a Pole with one ItemFieldValue per field whose
+# excel_column is in the file. Rows are streamed and written with bulk_create in
+# batches; identifiers come from PoleSequence exactly as in create_project_item.
+# Rows may legitimately repeat every mapped value (two poles in the same
+# village), and the fields carry no unique key, so every non-blank row creates
+# a pole; importing the same file twice creates its poles twice.
+def import_poles(project, dry_run=False, batch_size=IMPORT_BATCH_SIZE):
+    """
+    Creates the poles listed in project.data_file and returns a report dict. With
+    dry_run nothing is written and identifiers are previewed without being reserved.
+    """
+    headers = set(get_file_headers(project))
+    field_defs = list(project.field_definitions.all())
+    mapped = [fd for fd in field_defs if fd.excel_column.strip() and fd.excel_column.strip() in headers]
+    report = {
+        'rows': 0, 'created': 0, 'blank': 0, 'groups': Counter(), 'samples': [],
+        'unmapped_fields': [fd.label for fd in field_defs if fd not in mapped], 'dry_run': dry_run,
+    }
+    if not mapped:
+        return report
+
+    group_index = next((i for i, fd in enumerate(mapped) if fd.is_grouping_key), None)
+    next_numbers = {}
+    batch = []
+    for values in iter_data_file_columns(project.data_file, [fd.excel_column.strip() for fd in mapped]):
+        report['rows'] += 1
+        values = tuple(value[:500] for value in values)
+        if not any(values):
+            report['blank'] += 1
+        else:
+            batch.append(values)
+            if len(batch) >= batch_size:
+                _import_batch(project, mapped, group_index, batch, next_numbers, report)
+                batch = []
+    if batch:
+        _import_batch(project, mapped, group_index, batch, next_numbers, report)
+
+    if report['created'] and not dry_run:
+        # bulk_create skips the signals that normally invalidate the client pages
+        # (the search documents are written per batch above)
+        Project.objects.filter(pk=project.pk).bump_content_version()
+    return report
+
+def _import_batch(project, field_defs, group_index, batch, next_numbers, report):
+    dry_run = report['dry_run']
+    group_values = [row[group_index] if group_index is not None else '' for row in batch]
+
+    with transaction.atomic():
+        counts = Counter(group_values)
+        report['groups'].update(counts)
+        if dry_run:
+            for group_value in counts:
+                next_numbers.setdefault(group_value, PoleSequence.objects.peek(project, group_value))
+        else:
+            next_numbers.update(PoleSequence.objects.allocate_many(project, counts))
+
+        identifiers = []
+        for group_value in group_values:
+            identifiers.append(PoleSequence.format_identifier(project, group_value, next_numbers[group_value]))
+            next_numbers[group_value] += 1
+        report['samples'].extend(identifiers[:SAMPLE_SIZE - len(report['samples'])])
+        report['created'] += len(batch)
+        if dry_run:
+            return
+
+        poles = Pole.objects.bulk_create([
+            Pole(project=project, identifier=identifier, custom_id=custom_id)
+            for identifier, custom_id in zip(identifiers, Pole.objects.new_custom_ids(len(batch)))
+        ])
+        ItemFieldValue.objects.bulk_create([
+            ItemFieldValue(pole=pole, field_def=field_def, value=value)
+            for pole, row in zip(poles, batch)
+            for field_def, value in zip(field_defs, row) if value
+        ])
+        PoleSearchDocument.objects.rebuild([pole.pk for pole in poles])
+
+def format_report(report):
+    """Human-readable summary used by the command and the admin action."""
+    verb = "Would create" if report['dry_run'] else "Created"
+    lines = [
+        f"{verb} {report['created']} of {report['rows']} rows "
+        f"({report['blank']} blank)."
+    ]
+    if report['groups']:
+        top = ", ".join(f"{group or '(no group)'}: {count}" for group, count in report['groups'].most_common(10))
+        lines.append(f"Groups: {top}")
+    if report['samples']:
+        lines.append(f"Identifiers: {', '.join(report['samples'])}")
+    if report['unmapped_fields']:
+        lines.append(f"Fields not in the data file: {', '.join(report['unmapped_fields'])}")
+    return "\n".join(lines)
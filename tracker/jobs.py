@@ -0,0 +1,139 @@
+import logging
+import os
+from datetime import timedelta
+from cloudinary import uploader
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import InMemoryUploadedFile
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from .models import Evidence, EvidenceJob, Pole, Project
+from .utils import ImageIngest, watermark_image, make_image_derivatives, get_address_from_coords
+
+logger = logging.getLogger(__name__)
+
+# A RUNNING job whose worker died is picked up again after this long
+STALE_JOB_TIMEOUT = timedelta(minutes=10)
+# Evidence columns written by process_evidence_job
+EVIDENCE_RESULT_FIELDS = ('image', 'thumbnail', 'medium', 'gps_lat', 'gps_long', 'address')
+
+
+# ==========================================
+# 1. ENQUEUE
+# ==========================================
+def enqueue_evidence(evidence, raw_file):
+    """
+    Saves `evidence` as PROCESSING together with a job holding the raw upload.
+    With EVIDENCE_ASYNC_PROCESSING off the job is processed once the
+    surrounding transaction commits (immediately when there is none).
+    """
+    if hasattr(raw_file, 'seek'): raw_file.seek(0)
+    with transaction.atomic():
+        evidence.image = ''
+        evidence.status = 'PROCESSING'
+        evidence.save()
+        job = EvidenceJob.objects.create(evidence=evidence, raw_image=raw_file.read(), file_name=raw_file.name)
+
+    if not settings.EVIDENCE_ASYNC_PROCESSING:
+        transaction.on_commit(lambda: _run_inline(job))
+    return job
+
+def _run_inline(job):
+    claimed = EvidenceJob.objects.filter(pk=job.pk, status='PENDING').update(
+        status='RUNNING', started_at=timezone.now(), attempts=F('attempts') + 1
+    )
+    if claimed:
+        job.refresh_from_db()
+        run_job(job)
+
+
+# ==========================================
+# 2. WORKER SIDE
+# ==========================================
+def claim_next_job():
+    """
+    Atomically moves the oldest runnable job to RUNNING and returns it, or None.
+    The conditional UPDATE makes this safe across threads and processes on any
+    database backend, without relying on SELECT ... SKIP LOCKED.
+    """
+    now = timezone.now()
+    runnable = Q(status='PENDING') | Q(status='RUNNING', started_at__lt=now - STALE_JOB_TIMEOUT)
+    for job_id in EvidenceJob.objects.filter(runnable).order_by('created_at').values_list('id', flat=True)[:10]:
+        claimed = EvidenceJob.objects.filter(runnable, pk=job_id).update(
+            status='RUNNING', started_at=now, attempts=F('attempts') + 1
+        )
+        if claimed:
+            return EvidenceJob.objects.select_related('evidence__pole', 'evidence__stage').get(pk=job_id)
+    return None
+
+def process_evidence_job(job):
+    """EXIF fallback, watermarking, derivatives and the storage upload for one claimed job."""
+    evidence = job.evidence
+    # Opened once: EXIF is read from the header here, pixels are decoded by the watermark step
+    ingest = ImageIngest(ContentFile(bytes(job.raw_image), name=job.file_name))
+
+    lat, lon = evidence.gps_lat, evidence.gps_long
+    if lat is None or lon is None:
+        exif_lat, exif_lon = ingest.gps
+        if exif_lat and exif_lon:
+            lat, lon = exif_lat, exif_lon
+            evidence.gps_lat, evidence.gps_long = lat, lon
+
+    # Resolved once per Evidence; retries and re-processing reuse the stored address
+    address = evidence.address
+    if not address and lat is not None and lon is not None:
+        address = get_address_from_coords(lat, lon)
+        if address != "Location Unknown":
+            evidence.address = address
+
+    branded_content = watermark_image(ingest, lat, lon, address=address)
+    evidence.image = InMemoryUploadedFile(
+        file=branded_content, field_name=None, name=job.file_name,
+        content_type='image/jpeg', size=branded_content.size, charset=None
+    )
+    # Small copies for galleries and previews; a failure here leaves pages on the original
+    stem = os.path.splitext(os.path.basename(job.file_name))[0] or 'evidence'
+    try:
+        for field_name, content in make_image_derivatives(branded_content if branded_content is ingest.file else ingest.image).items():
+            getattr(evidence, field_name).save(f"{stem}_{field_name}.jpg", content, save=False)
+    except Exception as e:
+        logger.warning(f"Evidence {evidence.pk}: derivatives not generated: {e}")
+    branded_content.seek(0)
+
+    # The photo may have been deleted or replaced while it was processed. Only a
+    # row still PROCESSING is updated, so a removed one is never saved back
+    values = {name: Evidence._meta.get_field(name).pre_save(evidence, False) for name in EVIDENCE_RESULT_FIELDS}
+    with transaction.atomic():
+        if Evidence.objects.filter(pk=evidence.pk, status='PROCESSING').update(status='READY', **values):
+            # The UPDATE sends no signals; the photo now counts towards progress
+            # and shows on the client pages
+            Pole.objects.apply_evidence_change(evidence.pole_id, evidence.stage, 1)
+            Project.objects.filter(poles=evidence.pole_id).bump_content_version()
+            return
+    logger.info(f"Evidence {evidence.pk} was removed while processing; discarding its files")
+    evidence.delete_derivatives()
+    # pre_save above already uploaded the watermarked photo
+    try:
+        uploader.destroy(evidence.image.public_id, invalidate=True)
+    except Exception as e:
+        logger.warning(f"Evidence {evidence.pk}: uploaded photo {evidence.image.public_id} not deleted: {e}")
+
+def run_job(job):
+    """Processes a claimed job and records the outcome; never raises."""
+    try:
+        process_evidence_job(job)
+    except Exception as e:
+        logger.error(f"Evidence job {job.pk} failed (attempt {job.attempts}): {e}", exc_info=True)
+        failed = job.attempts >= settings.EVIDENCE_JOB_MAX_ATTEMPTS
+        EvidenceJob.objects.filter(pk=job.pk).update(
+            status='FAILED' if failed else 'PENDING', last_error=str(e), finished_at=timezone.now() if failed else None
+        )
+        if failed:
+            Evidence.objects.filter(pk=job.evidence_id).update(status='FAILED')
+            Project.objects.filter(poles__evidence=job.evidence_id).bump_content_version()
+        return False
+
+    # The raw upload is no longer needed once the processed image is stored
+    EvidenceJob.objects.filter(pk=job.pk).update(status='DONE', raw_image=b'', last_error='', finished_at=timezone.now())
+    return True
@@ -0,0 +1,38 @@
+from datetime import timedelta
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from tracker.archive import archive_project_logs
+from tracker.models import Project
+
+
+class Command(BaseCommand):
+    help = "Moves old ProjectLog rows into gzip-compressed JSON-lines archives in storage."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=settings.LOG_RETENTION_DAYS,
+                            help="Archive entries older than this many days (default: LOG_RETENTION_DAYS).")
+        parser.add_argument('--completed', action='store_true', help="Also archive every entry of COMPLETED projects.")
+        parser.add_argument('--project', type=int, nargs='+', help="Only these project ids.")
+        parser.add_argument('--max-rows', type=int, default=settings.LOG_ARCHIVE_MAX_ROWS, help="Entries per archive file.")
+        parser.add_argument('--dry-run', action='store_true', help="Report what would be archived without writing.")
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(days=options['days'])
+        projects = Project.objects.order_by('id')
+        if options['project']:
+            projects = projects.filter(pk__in=options['project'])
+
+        total_archives = total_moved = 0
+        for project in projects:
+            before = None if options['completed'] and project.status == 'COMPLETED' else cutoff
+            archives, moved = archive_project_logs(project, before=before, max_rows=max(1, options['max_rows']), dry_run=options['dry_run'])
+            if moved:
+                scope = f"all {moved} entries" if before is None else f"{moved} entries before {before:%Y-%m-%d}"
+                verb = "Would archive" if options['dry_run'] else "Archived"
+                self.stdout.write(f"{project.name}: {verb} {scope}" + ("" if options['dry_run'] else f" into {archives} file(s)"))
+            total_archives += archives
+            total_moved += moved
+
+        verb = "Would archive" if options['dry_run'] else "Archived"
+        self.stdout.write(self.style.SUCCESS(f"{verb} {total_moved} log entries" + ("." if options['dry_run'] else f" into {total_archives} file(s).")))
@@ -0,0 +1,101 @@
+import csv
+import multiprocessing
+import os
+import random
+import resource
+import tempfile
+import time
+import openpyxl
+from django.core.files import File
+from django.core.management.base import BaseCommand
+from tracker.utils import parse_data_file
+
+HEADERS = ['Pole ID', 'District', 'Block', 'Village', 'Scheme Name', 'Contractor', 'Capacity (kW)']
+
+
+def _rows(count):
+    """Master-list shaped rows: a unique ID, a few thousand villages and some low-cardinality columns."""
+    rng = random.Random(42)
+    for i in range(count):
+        yield [
+            f"UP-{i:07d}", f"District {rng.randrange(75)}", f"Block {rng.randrange(800)}",
+            f"Village {rng.randrange(5000)}", f"Scheme {rng.randrange(40)}",
+            f"Contractor {rng.randrange(120)}", rng.choice([1, 2, 3, 5, 7.5]),
+        ]
+
+def _write_csv(path, count):
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(HEADERS)
+        writer.writerows(_rows(count))
+
+def _write_xlsx(path, count):
+    workbook = openpyxl.Workbook(write_only=True)
+    sheet = workbook.create_sheet()
+    sheet.append(HEADERS)
+    for row in _rows(count):
+        sheet.append(row)
+    workbook.save(path)
+
+def _legacy_options(file_field, column_name):
+    # The previous implementation: full workbook object graph / whole CSV in memory
+    file_field.seek(0)
+    options = set()
+    if file_field.name.lower().endswith('.xlsx'):
+        sheet = openpyxl.load_workbook(file_field, data_only=True).active
+        headers = [str(cell.value).strip() if cell.value else '' for cell in sheet[1]]
+        idx = headers.index(column_name)
+        for row in sheet.iter_rows(min_row=2, values_only=True):
+            if row[idx]: options.add(str(row[idx]).strip())
+    else:
+        reader = csv.DictReader(file_field.read().decode('utf-8-sig').splitlines())
+        for row in reader:
+            if row.get(column_name): options.add(row[column_name].strip())
+    return sorted(options)
+
+def _streaming_options(file_field, column_name):
+    return parse_data_file(file_field, columns={column_name})[1][column_name]
+
+def _run_case(parser, path, column, results):
+    # Runs in a forked child so ru_maxrss reflects this case alone
+    baseline_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    with open(path, 'rb') as f:
+        started = time.perf_counter()
+        values = parser(File(f, name=path), column)
+        elapsed = time.perf_counter() - started
+    peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    results.put((elapsed, peak_kb - baseline_kb, len(values)))
+
+
+class Command(BaseCommand):
+    help = "Compares legacy and streaming data-file parsing time and peak memory on a generated master list."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=500_000)
+        parser.add_argument('--formats', nargs='+', choices=['csv', 'xlsx'], default=['csv', 'xlsx'])
+        parser.add_argument('--column', default='Village', choices=HEADERS)
+        parser.add_argument('--skip-legacy', action='store_true', help="Only run the streaming parser.")
+
+    def handle(self, *args, **options):
+        cases = [('streaming', _streaming_options)]
+        if not options['skip_legacy']:
+            cases.insert(0, ('legacy', _legacy_options))
+
+        ctx = multiprocessing.get_context('fork')
+        with tempfile.TemporaryDirectory() as workdir:
+            self.stdout.write(f"{'file':>6} {'size':>9} {'parser':>10} {'seconds':>8} {'peak MB':>8} {'values':>7}")
+            for fmt in options['formats']:
+                path = os.path.join(workdir, f"master_list.{fmt}")
+                self.stderr.write(f"Generating {options['rows']:,} row {fmt} file...")
+                (_write_csv if fmt == 'csv' else _write_xlsx)(path, options['rows'])
+                size_mb = os.path.getsize(path) / 1e6
+
+                for name, parser in cases:
+                    results = ctx.Queue()
+                    worker = ctx.Process(target=_run_case, args=(parser, path, options['column'], results))
+                    worker.start()
+                    elapsed, peak_kb, value_count = results.get()
+                    worker.join()
+                    self.stdout.write(
+                        f"{fmt:>6} {size_mb:>7.1f}MB {name:>10} {elapsed:>8.2f} {peak_kb / 1024:>8.0f} {value_count:>7}"
+                    )
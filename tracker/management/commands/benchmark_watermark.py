@@ -0,0 +1,63 @@
+import multiprocessing
+import resource
+import statistics
+import time
+from io import BytesIO
+from django.core.files.base import ContentFile
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+from PIL import Image
+from tracker.utils import watermark_image
+
+
+def _make_photo(megapixels):
+    """A JPEG of roughly `megapixels` MP in 4:3, with noise so it encodes like a real photo."""
+    height = int((megapixels * 1_000_000 * 3 / 4) ** 0.5)
+    width = height * 4 // 3
+    img = Image.merge("RGB", [Image.effect_noise((width, height), 40)] * 3)
+    buffer = BytesIO()
+    img.save(buffer, format='JPEG', quality=90)
+    return buffer.getvalue(), (width, height)
+
+def _run_case(photo, repeat, overrides, results):
+    # Runs in a forked child so ru_maxrss reflects this case alone
+    with override_settings(**overrides):
+        baseline_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            output = watermark_image(ContentFile(photo, name='bench.jpg'), '26.846700', '80.946200', address="Benchmark Village, Lucknow, Uttar Pradesh")
+            timings.append(time.perf_counter() - started)
+        peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    results.put((timings, peak_kb - baseline_kb, output.size))
+
+
+class Command(BaseCommand):
+    help = "Measures watermark_image time and peak memory across photo sizes."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--megapixels', type=float, nargs='+', default=[2, 12, 24, 50])
+        parser.add_argument('--repeat', type=int, default=3)
+        parser.add_argument('--max-dimension', type=int, help="Override WATERMARK_MAX_DIMENSION for the run.")
+        parser.add_argument('--quality', type=int, help="Override WATERMARK_JPEG_QUALITY for the run.")
+
+    def handle(self, *args, **options):
+        overrides = {}
+        if options['max_dimension'] is not None:
+            overrides['WATERMARK_MAX_DIMENSION'] = options['max_dimension']
+        if options['quality'] is not None:
+            overrides['WATERMARK_JPEG_QUALITY'] = options['quality']
+
+        ctx = multiprocessing.get_context('fork')
+        self.stdout.write(f"{'size':>16} {'input':>9} {'median s':>9} {'min s':>7} {'peak MB':>8} {'output':>9}")
+        for megapixels in options['megapixels']:
+            photo, (width, height) = _make_photo(megapixels)
+            results = ctx.Queue()
+            worker = ctx.Process(target=_run_case, args=(photo, options['repeat'], overrides, results))
+            worker.start()
+            timings, peak_kb, output_size = results.get()
+            worker.join()
+            self.stdout.write(
+                f"{width:>7}x{height:<8} {len(photo) / 1e6:>7.1f}MB {statistics.median(timings):>9.3f} "
+                f"{min(timings):>7.3f} {peak_kb / 1024:>8.0f} {output_size / 1e6:>7.1f}MB"
+            )
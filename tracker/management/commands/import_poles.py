@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand, CommandError
+from tracker.importer import IMPORT_BATCH_SIZE, format_report, import_poles
+from tracker.models import Project
+from tracker.views import log_action
+
+
+class Command(BaseCommand):
+    help = "Creates a project's poles from its data file, one per row, mapping columns to the item fields."
+
+    def add_arguments(self, parser):
+        parser.add_argument('project', type=int, help="Project id.")
+        parser.add_argument('--dry-run', action='store_true', help="Report what would be created without writing.")
+        parser.add_argument('--batch-size', type=int, default=IMPORT_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        project = Project.objects.select_related('project_type').filter(pk=options['project']).first()
+        if project is None:
+            raise CommandError(f"Project {options['project']} does not exist.")
+        if not project.data_file:
+            raise CommandError(f"Project '{project}' has no data file.")
+
+        report = import_poles(project, dry_run=options['dry_run'], batch_size=max(1, options['batch_size']))
+        if report['created'] and not report['dry_run']:
+            log_action(
+                project, None, "Imported Items", "Data File", f"{report['created']} items from {project.data_file.name}",
+                data={'created': report['created'], 'file': project.data_file.name},
+            )
+        self.stdout.write(self.style.SUCCESS(format_report(report)))
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from tracker.models import Pole
+
+
+class Command(BaseCommand):
+    help = "Recomputes the denormalized stage-progress counters on every Pole from its Evidence."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--project', type=int, help="Only rebuild poles of this project id.")
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        poles = Pole.objects.all()
+        if options['project']:
+            poles = poles.filter(project_id=options['project'])
+        updated = poles.rebuild_progress(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt progress counters for {updated} poles."))
@@ -0,0 +1,47 @@
+import signal
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connection
+from tracker.jobs import claim_next_job, run_job
+from tracker.utils import resolve_watermark_font_path
+
+
+class Command(BaseCommand):
+    help = "Processes queued evidence uploads (EXIF, watermark, storage upload) from the EvidenceJob table."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=2, help="Jobs processed in parallel.")
+        parser.add_argument('--poll-interval', type=float, default=2.0, help="Seconds to sleep when the queue is empty.")
+        parser.add_argument('--once', action='store_true', help="Drain the queue and exit instead of polling forever.")
+
+    def handle(self, *args, **options):
+        self.stopping = threading.Event()
+        signal.signal(signal.SIGTERM, lambda *_: self.stopping.set())
+        signal.signal(signal.SIGINT, lambda *_: self.stopping.set())
+
+        # Probe the watermark font once up front rather than on the first upload
+        resolve_watermark_font_path()
+
+        threads = max(1, options['threads'])
+        self.stdout.write(f"Evidence worker started with {threads} thread(s).")
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            results = [pool.submit(self.work_loop, options['poll_interval'], options['once']) for _ in range(threads)]
+        processed = sum(r.result() for r in results)
+        self.stdout.write(self.style.SUCCESS(f"Evidence worker stopped after {processed} job(s)."))
+
+    def work_loop(self, poll_interval, once):
+        processed = 0
+        try:
+            while not self.stopping.is_set():
+                close_old_connections()
+                job = claim_next_job()
+                if job is None:
+                    if once: break
+                    self.stopping.wait(poll_interval)
+                    continue
+                run_job(job)
+                processed += 1
+        finally:
+            connection.close()
+        return processed
@@ -0,0 +1,50 @@
+# Generated by Django 5.0.1 on 2026-10-18 05:37
+
+from django.db import migrations, models
+from django.db.models import Count, Max, Q
+
+
+def backfill_counters(apps, schema_editor):
+    Pole = apps.get_model('tracker', 'Pole')
+    poles = Pole.objects.annotate(
+        done=Count('evidence__stage', distinct=True),
+        required_done=Count('evidence__stage', filter=Q(evidence__stage__is_required=True), distinct=True),
+        last_at=Max('evidence__captured_at'),
+    ).filter(done__gt=0)
+    batch = []
+    for pole in poles.iterator(chunk_size=500):
+        pole.stages_done = pole.done
+        pole.required_stages_done = pole.required_done
+        pole.last_evidence_at = pole.last_at
+        batch.append(pole)
+        if len(batch) >= 500:
+            Pole.objects.bulk_update(batch, ['stages_done', 'required_stages_done', 'last_evidence_at'])
+            batch = []
+    if batch:
+        Pole.objects.bulk_update(batch, ['stages_done', 'required_stages_done', 'last_evidence_at'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tracker', '0012_projectlog'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pole',
+            name='last_evidence_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='pole',
+            name='required_stages_done',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='pole',
+            name='stages_done',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.0.1 on 2026-10-18 05:39
+
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tracker', '0013_pole_progress_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='project',
+            name='content_version',
+            field=models.UUIDField(default=uuid.uuid4, editable=False),
+        ),
+    ]
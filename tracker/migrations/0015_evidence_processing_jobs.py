@@ -0,0 +1,37 @@
+# Generated by Django 5.0.1 on 2026-10-18 05:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tracker', '0014_project_content_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='evidence',
+            name='status',
+            field=models.CharField(choices=[('PROCESSING', 'Processing'), ('READY', 'Ready'), ('FAILED', 'Failed')], default='READY', max_length=20),
+        ),
+        migrations.CreateModel(
+            name='EvidenceJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('raw_image', models.BinaryField()),
+                ('file_name', models.CharField(max_length=255)),
+                ('status', models.CharField(choices=[('PENDING', 'Pending'), ('RUNNING', 'Running'), ('DONE', 'Done'), ('FAILED', 'Failed')], default='PENDING', max_length=20)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('last_error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('evidence', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='job', to='tracker.evidence')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['status', 'created_at'], name='tracker_evi_status_5ef0c8_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.0.1 on 2026-10-18 05:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tracker', '0015_evidence_processing_jobs'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GeocodeCache',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(help_text="'lat,lon' rounded, e.g. '26.8467,80.9462'", max_length=50, unique=True)),
+                ('address', models.TextField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='evidence',
+            name='address',
+            field=models.TextField(blank=True),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.0.1 on 2026-10-18 05:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tracker', '0016_geocode_cache'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='evidence',
+            name='medium',
+            field=models.FileField(blank=True, editable=False, upload_to='evidence/medium/'),
+        ),
+        migrations.AddField(
+            model_name='evidence',
+            name='thumbnail',
+            field=models.FileField(blank=True, editable=False, upload_to='evidence/thumb/'),
+        ),
+    ]
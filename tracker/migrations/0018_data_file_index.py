@@ -0,0 +1,44 @@
+# Generated by Django 5.0.1 on 2026-10-18 05:47
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tracker', '0017_evidence_derivatives'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DataFileIndex',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('file_name', models.CharField(help_text='Storage name of the data file that was parsed', max_length=255)),
+                ('content_hash', models.CharField(db_index=True, help_text='SHA-256 of the file contents', max_length=64)),
+                ('headers', models.JSONField(default=list)),
+                ('row_count', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('project', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='data_file_indexes', to='tracker.project')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='DataFileColumn',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255)),
+                ('values', models.JSONField(default=list)),
+                ('value_count', models.PositiveIntegerField(default=0)),
+                ('index', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='columns', to='tracker.datafileindex')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='datafileindex',
+            constraint=models.UniqueConstraint(fields=('project', 'file_name'), name='unique_data_file_index'),
+        ),
+        migrations.AddConstraint(
+            model_name='datafilecolumn',
+            constraint=models.UniqueConstraint(fields=('index', 'name'), name='unique_data_file_column'),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.0.1 on 2026-10-18 05:57
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tracker', '0018_data_file_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PoleSequence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('group_value', models.CharField(blank=True, max_length=500)),
+                ('last_value', models.PositiveIntegerField(default=0)),
+                ('project', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='pole_sequences', to='tracker.project')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='polesequence',
+            constraint=models.UniqueConstraint(fields=('project', 'group_value'), name='unique_pole_sequence'),
+        ),
+    ]
@@ -0,0 +1,62 @@
+# Generated by Django 5.0.1 on 2026-10-18 06:01
+
+from django.db import migrations, models
+from django.db.models import Q
+
+# Frozen copies of tracker.models at the time of this migration, so later
+# changes to the model code cannot alter what it does on a fresh database
+POLE_CUSTOM_ID_SEQUENCE = 'pole_custom_id'
+CUSTOM_ID_ALPHABET = '0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ'
+CUSTOM_ID_LENGTH = 6
+CUSTOM_ID_SPACE = len(CUSTOM_ID_ALPHABET) ** CUSTOM_ID_LENGTH
+CUSTOM_ID_MULTIPLIER = 1345294741
+CUSTOM_ID_OFFSET = 987654321
+
+
+def encode_custom_id(number):
+    value = (number * CUSTOM_ID_MULTIPLIER + CUSTOM_ID_OFFSET) % CUSTOM_ID_SPACE
+    chars = []
+    for _ in range(CUSTOM_ID_LENGTH):
+        value, digit = divmod(value, len(CUSTOM_ID_ALPHABET))
+        chars.append(CUSTOM_ID_ALPHABET[digit])
+    return '#' + ''.join(reversed(chars))
+
+
+def backfill_custom_ids(apps, schema_editor):
+    # Replaces the per-request self-healing in the dashboard: gives every pole
+    # without a code one from the counter, skipping codes already in use
+    Pole = apps.get_model('tracker', 'Pole')
+    IdSequence = apps.get_model('tracker', 'IdSequence')
+    missing = list(Pole.objects.filter(Q(custom_id__isnull=True) | Q(custom_id='')).only('id'))
+    if not missing:
+        return
+    taken = set(Pole.objects.exclude(custom_id__isnull=True).values_list('custom_id', flat=True))
+    sequence, _ = IdSequence.objects.get_or_create(name=POLE_CUSTOM_ID_SEQUENCE)
+    number = sequence.last_value
+    for pole in missing:
+        number += 1
+        while encode_custom_id(number) in taken:
+            number += 1
+        pole.custom_id = encode_custom_id(number)
+    Pole.objects.bulk_update(missing, ['custom_id'], batch_size=500)
+    sequence.last_value = number
+    sequence.save(update_fields=['last_value'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tracker', '0019_pole_sequence'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IdSequence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True)),
+                ('last_value', models.PositiveBigIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(backfill_custom_ids, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,101 @@
+# Generated by Django 5.0.1 on 2026-10-18 06:03
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+# Frozen copies of tracker.models at the time of this migration
+SEARCH_FTS_TABLE = 'tracker_polesearch_fts'
+
+
+def search_document_body(identifier, custom_id, project_name, values):
+    return " ".join(part for part in [identifier, custom_id or '', project_name, *values] if part)
+
+
+SQLITE_FORWARD = [
+    # External-content FTS5 table over tracker_polesearchdocument, synced by
+    # triggers. Prefix indexes up to 6 characters keep "term*" queries on
+    # common words (village names) from scanning every matching token.
+    f"""CREATE VIRTUAL TABLE {SEARCH_FTS_TABLE} USING fts5(
+        body, content='tracker_polesearchdocument', content_rowid='pole_id',
+        tokenize='unicode61 remove_diacritics 2', prefix='1 2 3 4 5 6'
+    )""",
+    f"""CREATE TRIGGER tracker_polesearch_ai AFTER INSERT ON tracker_polesearchdocument BEGIN
+        INSERT INTO {SEARCH_FTS_TABLE}(rowid, body) VALUES (new.pole_id, new.body);
+    END""",
+    f"""CREATE TRIGGER tracker_polesearch_ad AFTER DELETE ON tracker_polesearchdocument BEGIN
+        INSERT INTO {SEARCH_FTS_TABLE}({SEARCH_FTS_TABLE}, rowid, body) VALUES ('delete', old.pole_id, old.body);
+    END""",
+    f"""CREATE TRIGGER tracker_polesearch_au AFTER UPDATE ON tracker_polesearchdocument BEGIN
+        INSERT INTO {SEARCH_FTS_TABLE}({SEARCH_FTS_TABLE}, rowid, body) VALUES ('delete', old.pole_id, old.body);
+        INSERT INTO {SEARCH_FTS_TABLE}(rowid, body) VALUES (new.pole_id, new.body);
+    END""",
+]
+SQLITE_REVERSE = [
+    "DROP TRIGGER IF EXISTS tracker_polesearch_au",
+    "DROP TRIGGER IF EXISTS tracker_polesearch_ad",
+    "DROP TRIGGER IF EXISTS tracker_polesearch_ai",
+    f"DROP TABLE IF EXISTS {SEARCH_FTS_TABLE}",
+]
+POSTGRES_FORWARD = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX tracker_polesearch_tsv ON tracker_polesearchdocument USING gin (to_tsvector('simple', body))",
+    "CREATE INDEX tracker_polesearch_trgm ON tracker_polesearchdocument USING gin (body gin_trgm_ops)",
+]
+POSTGRES_REVERSE = [
+    "DROP INDEX IF EXISTS tracker_polesearch_trgm",
+    "DROP INDEX IF EXISTS tracker_polesearch_tsv",
+]
+
+
+def _run(schema_editor, statements):
+    for statement in statements.get(schema_editor.connection.vendor, []):
+        schema_editor.execute(statement)
+
+def create_search_backend(apps, schema_editor):
+    _run(schema_editor, {'sqlite': SQLITE_FORWARD, 'postgresql': POSTGRES_FORWARD})
+
+def drop_search_backend(apps, schema_editor):
+    _run(schema_editor, {'sqlite': SQLITE_REVERSE, 'postgresql': POSTGRES_REVERSE})
+
+def backfill_documents(apps, schema_editor):
+    Pole = apps.get_model('tracker', 'Pole')
+    ItemFieldValue = apps.get_model('tracker', 'ItemFieldValue')
+    PoleSearchDocument = apps.get_model('tracker', 'PoleSearchDocument')
+    poles = Pole.objects.order_by('pk').values_list('pk', 'project_id', 'identifier', 'custom_id', 'project__name')
+    batch = []
+    for row in poles.iterator(chunk_size=1000):
+        batch.append(row)
+        if len(batch) >= 1000:
+            _write_documents(ItemFieldValue, PoleSearchDocument, batch)
+            batch = []
+    if batch:
+        _write_documents(ItemFieldValue, PoleSearchDocument, batch)
+
+def _write_documents(ItemFieldValue, PoleSearchDocument, rows):
+    values = {}
+    for pole_id, value in ItemFieldValue.objects.filter(pole_id__in=[row[0] for row in rows]).order_by('field_def_id').values_list('pole_id', 'value'):
+        values.setdefault(pole_id, []).append(value)
+    PoleSearchDocument.objects.bulk_create([
+        PoleSearchDocument(pole_id=pole_id, project_id=project_id, body=search_document_body(identifier, custom_id, project_name, values.get(pole_id, [])))
+        for pole_id, project_id, identifier, custom_id, project_name in rows
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tracker', '0020_pole_custom_id_sequence'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PoleSearchDocument',
+            fields=[
+                ('pole', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='search_document', serialize=False, to='tracker.pole')),
+                ('body', models.TextField()),
+                ('project', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='tracker.project')),
+            ],
+        ),
+        migrations.RunPython(create_search_backend, drop_search_backend),
+        migrations.RunPython(backfill_documents, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.0.1 on 2026-10-18 06:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tracker', '0021_pole_search_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='evidence',
+            index=models.Index(fields=['pole', 'stage'], name='evidence_pole_stage_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='itemfieldvalue',
+            index=models.Index(fields=['field_def', 'value'], name='fieldvalue_def_value_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='pole',
+            index=models.Index(fields=['project', 'identifier'], name='pole_project_identifier_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='projectissue',
+            index=models.Index(fields=['pole', 'status'], name='issue_pole_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='projectlog',
+            index=models.Index(fields=['project', '-timestamp'], name='projectlog_project_time_idx'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.0.1 on 2026-10-18 06:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tracker', '0022_composite_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='projectlog',
+            options={'ordering': ['-timestamp', '-id']},
+        ),
+        migrations.RemoveIndex(
+            model_name='projectlog',
+            name='projectlog_project_time_idx',
+        ),
+        migrations.AddIndex(
+            model_name='projectlog',
+            index=models.Index(fields=['project', '-timestamp', '-id'], name='projectlog_project_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='projectlog',
+            index=models.Index(fields=['project', 'action', '-timestamp', '-id'], name='projectlog_project_action_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='projectlog',
+            index=models.Index(fields=['project', 'user', '-timestamp', '-id'], name='projectlog_project_user_idx'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.0.1 on 2026-10-18 06:21
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tracker', '0023_project_log_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='projectlog',
+            name='timestamp',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.0.1 on 2026-10-18 06:22
+
+import django.db.models.fields.json
+import django.db.models.functions.comparison
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tracker', '0024_project_log_timestamp_default'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='projectlog',
+            name='payload',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.AddField(
+            model_name='projectlog',
+            name='pole_ref',
+            field=models.GeneratedField(db_persist=True, expression=django.db.models.functions.comparison.Cast(django.db.models.fields.json.KeyTextTransform('pole_id', 'payload'), models.BigIntegerField()), output_field=models.BigIntegerField(null=True)),
+        ),
+        migrations.AddField(
+            model_name='projectlog',
+            name='stage_ref',
+            field=models.GeneratedField(db_persist=True, expression=django.db.models.functions.comparison.Cast(django.db.models.fields.json.KeyTextTransform('stage_id', 'payload'), models.BigIntegerField()), output_field=models.BigIntegerField(null=True)),
+        ),
+        migrations.AddIndex(
+            model_name='projectlog',
+            index=models.Index(fields=['project', 'stage_ref', '-timestamp', '-id'], name='projectlog_project_stage_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='projectlog',
+            index=models.Index(fields=['project', 'pole_ref', '-timestamp', '-id'], name='projectlog_project_pole_idx'),
+        ),
+    ]
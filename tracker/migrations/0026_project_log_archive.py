@@ -0,0 +1,30 @@
+# Generated by Django 5.0.1 on 2026-10-18 06:24
+
+import cloudinary_storage.storage
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tracker', '0025_project_log_payload'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProjectLogArchive',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('file', models.FileField(storage=cloudinary_storage.storage.RawMediaCloudinaryStorage(), upload_to='log_archives/')),
+                ('oldest_at', models.DateTimeField()),
+                ('newest_at', models.DateTimeField()),
+                ('row_count', models.PositiveIntegerField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('project', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='log_archives', to='tracker.project')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['project', '-newest_at'], name='logarchive_project_newest_idx')],
+            },
+        ),
+    ]
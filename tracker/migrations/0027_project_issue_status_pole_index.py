@@ -0,0 +1,21 @@
+# Generated by Django 5.0.1 on 2026-10-18 06:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tracker', '0026_project_log_archive'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='projectissue',
+            name='issue_pole_status_idx',
+        ),
+        migrations.AddIndex(
+            model_name='projectissue',
+            index=models.Index(fields=['status', 'pole'], name='issue_status_pole_idx'),
+        ),
+    ]
@@ -1,9 +1,15 @@
+import re
 import uuid
-from django.db import models
+from datetime import datetime, time, timedelta
+from django.db import IntegrityError, connection, models, transaction
+from django.db.models import Case, Count, Exists, F, IntegerField, Max, OuterRef, Q, Subquery, Value, When
+from django.db.models.fields.json import KT
+from django.db.models.functions import Cast, Coalesce
+from django.utils.functional import cached_property
+from django.utils import timezone
 from django.contrib.auth.models import AbstractUser
 from cloudinary.models import CloudinaryField
 from cloudinary_storage.storage import RawMediaCloudinaryStorage
-from django.utils.crypto import get_random_string  # <--- Essential for custom_id
 
 class User(AbstractUser):
     ROLE_CHOICES = (('ADMIN', 'Admin'), ('CONTRACTOR', 'Contractor'))
@@ -29,6 +35,29 @@ class StageDefinition(models.Model):
     class Meta: ordering = ['order']
     def __str__(self): return f"{self.project_type.name} - {self.name}"
 
+class ProjectQuerySet(models.QuerySet):
+    def bump_content_version(self):
+        """Invalidates the cached public pages of these projects (see views.render_cached_fragment)."""
+        return self.update(content_version=uuid.uuid4())
+
+    def with_stats(self):
+        """
+        Annotates each project with its pole totals, completed count, percent
+        progress and open-issue flag so list pages need a single query.
+        """
+        open_issues = ProjectIssue.objects.filter(pole__project=OuterRef('pk'), status='OPEN')
+        return self.select_related('project_type').annotate(
+            pole_total=Count('poles', distinct=True),
+            pole_done=Count('poles', filter=Q(poles__is_completed=True), distinct=True),
+            open_issue_flag=Exists(open_issues),
+        ).annotate(
+            progress=Case(
+                When(pole_total=0, then=Value(0)),
+                default=F('pole_done') * 100 / F('pole_total'),
+                output_field=IntegerField(),
+            )
+        )
+
 class Project(models.Model):
     STATUS_CHOICES = [('ACTIVE', 'Active'), ('COMPLETED', 'Completed')]
     name = models.CharField(max_length=200, help_text="This is the 'City' name")
@@ -39,9 +68,16 @@ class Project(models.Model):
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='ACTIVE')
     contractors = models.ManyToManyField(User, limit_choices_to={'role': 'CONTRACTOR'}, related_name='assigned_projects', blank=True)
     data_file = models.FileField(upload_to='project_data/', blank=True, null=True, help_text="Upload CSV/Excel for dropdowns.", storage=RawMediaCloudinaryStorage())
+    # Changes on every write that affects the client pages; part of their cache key
+    content_version = models.UUIDField(default=uuid.uuid4, editable=False)
+
+    objects = ProjectQuerySet.as_manager()
 
     @property
     def has_open_issues(self):
+        # Use the with_stats() annotation when present to avoid a query per card
+        if hasattr(self, 'open_issue_flag'):
+            return self.open_issue_flag
         return self.poles.filter(issues__status='OPEN').exists()
 
     def __str__(self): return self.name
@@ -55,6 +91,177 @@ class ItemFieldDefinition(models.Model):
     is_grouping_key = models.BooleanField(default=False, help_text="Check this to use as the 'Village' grouping.")
     def __str__(self): return f"{self.project.name} - {self.label}"
 
+class DataFileIndex(models.Model):
+    """Headers of a parsed Project.data_file; one row per uploaded file version."""
+    project = models.ForeignKey(Project, on_delete=models.CASCADE, related_name='data_file_indexes')
+    file_name = models.CharField(max_length=255, help_text="Storage name of the data file that was parsed")
+    content_hash = models.CharField(max_length=64, db_index=True, help_text="SHA-256 of the file contents")
+    headers = models.JSONField(default=list)
+    row_count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=['project', 'file_name'], name='unique_data_file_index')]
+
+    def __str__(self): return f"{self.project.name}: {self.file_name}"
+
+class DataFileColumn(models.Model):
+    """Sorted distinct non-empty values of one data file column."""
+    index = models.ForeignKey(DataFileIndex, on_delete=models.CASCADE, related_name='columns')
+    name = models.CharField(max_length=255)
+    values = models.JSONField(default=list)
+    value_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=['index', 'name'], name='unique_data_file_column')]
+
+    def __str__(self): return f"{self.index} [{self.name}]"
+
+# Pole.custom_id codes are '#' + 6 base-36 characters. They are issued from a
+# counter mapped through an affine permutation of the 36^6 code space, so
+# consecutive poles get unrelated-looking codes and no two numbers share one.
+POLE_CUSTOM_ID_SEQUENCE = 'pole_custom_id'
+CUSTOM_ID_ALPHABET = '0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ'
+CUSTOM_ID_LENGTH = 6
+CUSTOM_ID_SPACE = len(CUSTOM_ID_ALPHABET) ** CUSTOM_ID_LENGTH
+CUSTOM_ID_MULTIPLIER = 1345294741  # coprime with 36, which makes the mapping a bijection
+CUSTOM_ID_OFFSET = 987654321
+
+def encode_custom_id(number):
+    value = (number * CUSTOM_ID_MULTIPLIER + CUSTOM_ID_OFFSET) % CUSTOM_ID_SPACE
+    chars = []
+    for _ in range(CUSTOM_ID_LENGTH):
+        value, digit = divmod(value, len(CUSTOM_ID_ALPHABET))
+        chars.append(CUSTOM_ID_ALPHABET[digit])
+    return '#' + ''.join(reversed(chars))
+
+class IdSequenceQuerySet(models.QuerySet):
+    def reserve(self, name, count=1):
+        """Reserves `count` consecutive numbers of the named counter and returns the first."""
+        with transaction.atomic():
+            sequence = self.filter(name=name)
+            if not sequence.update(last_value=F('last_value') + count):
+                try:
+                    with transaction.atomic():
+                        self.create(name=name, last_value=count)
+                except IntegrityError:
+                    sequence.update(last_value=F('last_value') + count)
+            return sequence.values_list('last_value', flat=True).get() - count + 1
+
+class IdSequence(models.Model):
+    """Named global counters (e.g. the source numbers of Pole.custom_id)."""
+    name = models.CharField(max_length=50, unique=True)
+    last_value = models.PositiveBigIntegerField(default=0)
+
+    objects = IdSequenceQuerySet.as_manager()
+
+    def __str__(self): return f"{self.name}: {self.last_value}"
+
+class PoleQuerySet(models.QuerySet):
+    def with_progress(self):
+        """
+        Annotates the open-issue flag and total stage count so list pages can
+        render progress without per-row queries.
+        """
+        open_issues = ProjectIssue.objects.filter(pole=OuterRef('pk'), status='OPEN')
+        stage_total = StageDefinition.objects.filter(
+            project_type=OuterRef('project__project_type')
+        ).order_by().values('project_type').annotate(c=Count('id')).values('c')
+        return self.annotate(
+            open_issue_flag=Exists(open_issues),
+            stage_total=Subquery(stage_total, output_field=IntegerField()),
+        )
+
+    def apply_evidence_change(self, pole_id, stage, delta):
+        """
+        Adjusts a pole's progress counters after one READY Evidence row for
+        `stage` appeared (delta=1: created READY or finished processing) or one
+        was removed (delta=-1). Must run inside the Evidence write transaction.
+        Photos still PROCESSING or FAILED never count.
+
+        A pole is completed once every required stage has a ready photo; a
+        project type without required stages needs at least one.
+
+        Additions are applied incrementally; a stage only counts once, so the
+        counters move only when its first ready photo appears. Removals recount
+        the pole from the remaining ready rows, because a queryset delete sends
+        every post_delete after all rows are already gone.
+        """
+        # Lock the pole row so concurrent uploads for it are counted one at a time
+        list(self.select_for_update().filter(pk=pole_id).values_list('pk', flat=True))
+        required_total = StageDefinition.objects.filter(project_type_id=stage.project_type_id, is_required=True).count()
+        remaining = Evidence.objects.filter(pole=OuterRef('pk'), status='READY').order_by().values('pole')
+        updates = {'last_evidence_at': Subquery(remaining.annotate(m=Max('captured_at')).values('m'))}
+
+        if delta > 0:
+            if Evidence.objects.filter(pole_id=pole_id, stage_id=stage.pk, status='READY').count() == 1:
+                required_delta = 1 if stage.is_required else 0
+                updates['stages_done'] = F('stages_done') + 1
+                updates['required_stages_done'] = F('required_stages_done') + required_delta
+                # SET expressions see the pre-update row, so compare the old value
+                updates['is_completed'] = Case(
+                    When(required_stages_done__gte=required_total - required_delta, then=Value(True)),
+                    default=Value(False),
+                )
+        else:
+            done = remaining.annotate(c=Count('stage', distinct=True)).values('c')
+            required_done = remaining.filter(stage__is_required=True).annotate(c=Count('stage', distinct=True)).values('c')
+            updates['stages_done'] = Coalesce(Subquery(done), 0)
+            updates['required_stages_done'] = Coalesce(Subquery(required_done), 0)
+        self.filter(pk=pole_id).update(**updates)
+
+        if delta < 0:
+            self.filter(pk=pole_id).update(is_completed=Case(
+                When(stages_done__gt=0, required_stages_done__gte=required_total, then=Value(True)),
+                default=Value(False),
+            ))
+
+    def rebuild_progress(self, batch_size=500):
+        """Recomputes the progress counters of every pole in this queryset from its READY Evidence."""
+        required_totals = dict(
+            StageDefinition.objects.filter(is_required=True).order_by()
+            .values('project_type').annotate(c=Count('id')).values_list('project_type', 'c')
+        )
+        ready = Q(evidence__status='READY')
+        rows = self.order_by().annotate(
+            project_type_id=F('project__project_type_id'),
+            done=Count('evidence__stage', filter=ready, distinct=True),
+            required_done=Count('evidence__stage', filter=ready & Q(evidence__stage__is_required=True), distinct=True),
+            last_at=Max('evidence__captured_at', filter=ready),
+        ).iterator(chunk_size=batch_size)
+
+        batch, updated = [], 0
+        for pole in rows:
+            pole.stages_done = pole.done
+            pole.required_stages_done = pole.required_done
+            pole.last_evidence_at = pole.last_at
+            pole.is_completed = pole.done > 0 and pole.required_done >= required_totals.get(pole.project_type_id, 0)
+            batch.append(pole)
+            if len(batch) >= batch_size:
+                updated += self.bulk_update(batch, ['stages_done', 'required_stages_done', 'last_evidence_at', 'is_completed'])
+                batch = []
+        if batch:
+            updated += self.bulk_update(batch, ['stages_done', 'required_stages_done', 'last_evidence_at', 'is_completed'])
+        if updated:
+            # bulk_update sends no signals; completion shows on the client pages
+            Project.objects.filter(pk__in=self.values('project_id')).bump_content_version()
+        return updated
+
+    def new_custom_ids(self, count):
+        """
+        `count` unused custom_id codes from one reserved block of the counter;
+        also used by bulk_create callers, which skip save().
+        """
+        codes = []
+        while len(codes) < count:
+            needed = count - len(codes)
+            first = IdSequence.objects.reserve(POLE_CUSTOM_ID_SEQUENCE, needed)
+            block = [encode_custom_id(number) for number in range(first, first + needed)]
+            # Only random codes issued before the counter existed can collide
+            taken = set(self.model._base_manager.filter(custom_id__in=block).values_list('custom_id', flat=True))
+            codes.extend(code for code in block if code not in taken)
+        return codes
+
 class Pole(models.Model):
     project = models.ForeignKey(Project, on_delete=models.CASCADE, related_name='poles')
     identifier = models.CharField(max_length=100)
@@ -64,42 +271,283 @@ class Pole(models.Model):
     
     is_completed = models.BooleanField(default=False)
 
+    # Denormalized progress counters over READY Evidence, maintained by the Evidence
+    # signals (see PoleQuerySet.apply_evidence_change) and rebuilt by `manage.py rebuild_pole_progress`
+    stages_done = models.PositiveIntegerField(default=0, editable=False)
+    required_stages_done = models.PositiveIntegerField(default=0, editable=False)
+    last_evidence_at = models.DateTimeField(null=True, blank=True, editable=False)
+
+    objects = PoleQuerySet.as_manager()
+
+    class Meta:
+        indexes = [models.Index(fields=['project', 'identifier'], name='pole_project_identifier_idx')]
+
     def save(self, *args, **kwargs):
         # Auto-generate ID if not set
         if not self.custom_id:
-            unique_code = get_random_string(6).upper()
-            self.custom_id = f"#{unique_code}" 
+            self.custom_id = Pole.objects.new_custom_ids(1)[0]
         super().save(*args, **kwargs)
 
     def __str__(self): return f"{self.project.name} - {self.identifier}"
     
+    @cached_property
+    def stage_total(self):
+        # Overridden by the with_progress() annotation on list queries
+        return self.project.project_type.stages.count()
+
     @property
     def progress_percent(self):
-        total = self.project.project_type.stages.count()
+        total = self.stage_total or 0
         if total == 0: return 0
-        from .models import Evidence
-        done = Evidence.objects.filter(pole=self).values('stage').distinct().count()
-        return int((done / total) * 100)
+        return int((self.stages_done / total) * 100)
 
     @property
     def has_open_issue(self):
+        if hasattr(self, 'open_issue_flag'):
+            return self.open_issue_flag
         return self.issues.filter(status='OPEN').exists()
 
+class PoleSequenceQuerySet(models.QuerySet):
+    def allocate(self, project, group_value='', count=1):
+        """
+        Reserves `count` consecutive identifier numbers for (project, group_value)
+        and returns the first. The increment is a single UPDATE ... F() + count, so
+        the row stays write-locked until the caller's transaction commits and
+        concurrent allocations queue behind it instead of reusing a number.
+        """
+        with transaction.atomic():
+            sequence = self.filter(project=project, group_value=group_value)
+            if not sequence.update(last_value=F('last_value') + count):
+                try:
+                    with transaction.atomic():
+                        self.create(project=project, group_value=group_value, last_value=self._seed(project, group_value) + count)
+                except IntegrityError:
+                    # Another transaction created the row first; increment theirs
+                    sequence.update(last_value=F('last_value') + count)
+            return sequence.values_list('last_value', flat=True).get() - count + 1
+
+    def allocate_many(self, project, counts):
+        """
+        allocate() for several groups at once: reserves counts[group_value] numbers
+        per group and returns {group_value: first number}. Groups that already have
+        a sequence row share a single UPDATE.
+        """
+        with transaction.atomic():
+            sequences = self.filter(project=project, group_value__in=counts)
+            increment = Case(*[When(group_value=g, then=Value(n)) for g, n in counts.items()], output_field=IntegerField())
+            sequences.update(last_value=F('last_value') + increment)
+            last_values = dict(sequences.values_list('group_value', 'last_value'))
+            for group_value in counts.keys() - last_values.keys():
+                last_values[group_value] = self.allocate(project, group_value, counts[group_value]) + counts[group_value] - 1
+            return {g: last_values[g] - n + 1 for g, n in counts.items()}
+
+    def peek(self, project, group_value=''):
+        """The number allocate() would return next, without reserving it."""
+        last_value = self.filter(project=project, group_value=group_value).values_list('last_value', flat=True).first()
+        return (self._seed(project, group_value) if last_value is None else last_value) + 1
+
+    def _seed(self, project, group_value):
+        # Continue after the highest number already in use; a plain count would
+        # reissue numbers once poles have been deleted
+        prefix = PoleSequence.format_identifier(project, group_value, '')
+        highest = 0
+        for identifier in project.poles.filter(identifier__startswith=prefix).values_list('identifier', flat=True):
+            digits = re.match(r'\d+', identifier[len(prefix):])
+            if digits: highest = max(highest, int(digits.group()))
+        return highest
+
+class PoleSequence(models.Model):
+    """Last identifier number issued per project and grouping value ('' when ungrouped)."""
+    project = models.ForeignKey(Project, on_delete=models.CASCADE, related_name='pole_sequences')
+    group_value = models.CharField(max_length=500, blank=True)
+    last_value = models.PositiveIntegerField(default=0)
+
+    objects = PoleSequenceQuerySet.as_manager()
+
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=['project', 'group_value'], name='unique_pole_sequence')]
+
+    @staticmethod
+    def format_identifier(project, group_value, number):
+        if group_value:
+            return f"{project.name}_{group_value} #{number}"
+        return f"{project.project_type.unit_name} #{number}"
+
+    def __str__(self): return f"{self.project.name} [{self.group_value or '-'}]: {self.last_value}"
+
 class ItemFieldValue(models.Model):
     pole = models.ForeignKey(Pole, on_delete=models.CASCADE, related_name='custom_values')
     field_def = models.ForeignKey(ItemFieldDefinition, on_delete=models.CASCADE)
     value = models.CharField(max_length=500)
+
+    class Meta:
+        # Dropdown/grouping lookups filter one field's values
+        indexes = [models.Index(fields=['field_def', 'value'], name='fieldvalue_def_value_idx')]
+
     def __str__(self): return f"{self.pole.identifier} - {self.value}"
 
+# === POLE SEARCH INDEX ===
+# One denormalized text document per pole (identifier, custom_id, project name
+# and custom field values), kept current by the signals in signals.py. The
+# documents are indexed by SQLite FTS5 or, on PostgreSQL, by tsvector and
+# pg_trgm GIN indexes; see migration 0021.
+SEARCH_FTS_TABLE = 'tracker_polesearch_fts'
+SEARCH_MAX_TERMS = 8
+SEARCH_RANK_CANDIDATES = 1000
+
+def search_document_body(identifier, custom_id, project_name, values):
+    return " ".join(part for part in [identifier, custom_id or '', project_name, *values] if part)
+
+def search_words(text):
+    """Lower-cased words; punctuation such as '#' and '_' separates them, as in the FTS tokenizer."""
+    return re.findall(r'[^\W_]+', text.lower())
+
+def search_terms(query):
+    return search_words(query)[:SEARCH_MAX_TERMS]
+
+class PoleSearchDocumentQuerySet(models.QuerySet):
+    def rebuild(self, poles, batch_size=1000):
+        """Writes the documents of `poles` (a Pole queryset or ids), replacing stale ones."""
+        pole_ids = poles.values_list('pk', flat=True) if isinstance(poles, models.QuerySet) else poles
+        pole_ids = list(pole_ids)
+        for start in range(0, len(pole_ids), batch_size):
+            chunk = pole_ids[start:start + batch_size]
+            values = {}
+            for pole_id, value in ItemFieldValue.objects.filter(pole_id__in=chunk).order_by('field_def_id').values_list('pole_id', 'value'):
+                values.setdefault(pole_id, []).append(value)
+            self.bulk_create([
+                PoleSearchDocument(pole_id=pole_id, project_id=project_id, body=search_document_body(identifier, custom_id, project_name, values.get(pole_id, [])))
+                for pole_id, project_id, identifier, custom_id, project_name in
+                Pole.objects.filter(pk__in=chunk).values_list('pk', 'project_id', 'identifier', 'custom_id', 'project__name')
+            ], update_conflicts=True, unique_fields=['pole'], update_fields=['project', 'body'])
+
+    def search(self, query, project_ids=None, limit=25, offset=0):
+        """
+        Pole ids whose document contains every term of `query` as a word
+        prefix. `project_ids` restricts the results (None = all projects).
+
+        Matches come from the full-text index in pole order. When at most
+        SEARCH_RANK_CANDIDATES match they are ranked by whole-word hits, then
+        by document length (shortest first). Broader queries (a term that half
+        the poles contain) stay in pole order. Scoring them would cost more
+        than the lookup and would not make the order more useful.
+        """
+        terms = search_terms(query)
+        if not terms: return []
+        if project_ids is not None:
+            project_ids = list(project_ids)
+            if not project_ids: return []
+
+        if connection.vendor == 'sqlite':
+            source = (
+                f"FROM {SEARCH_FTS_TABLE} JOIN tracker_polesearchdocument d ON d.pole_id = {SEARCH_FTS_TABLE}.rowid "
+                f"WHERE {SEARCH_FTS_TABLE} MATCH %s"
+            )
+            params = [" ".join(f'"{term}"*' for term in terms)]
+            natural_order = f"{SEARCH_FTS_TABLE}.rowid"
+        elif connection.vendor == 'postgresql':
+            # Word-prefix match through the tsvector index; the trigram index
+            # covers substrings inside longer tokens (e.g. part of a custom_id)
+            source = (
+                "FROM tracker_polesearchdocument d "
+                "WHERE (to_tsvector('simple', d.body) @@ to_tsquery('simple', %s) OR d.body ILIKE %s)"
+            )
+            pattern = query.strip().replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+            params = [" & ".join(f"{term}:*" for term in terms), f"%{pattern}%"]
+            natural_order = "d.pole_id"
+        else:
+            documents = self.all()
+            for term in terms: documents = documents.filter(body__icontains=term)
+            if project_ids is not None: documents = documents.filter(project_id__in=project_ids)
+            return list(documents.order_by('pole_id').values_list('pole_id', flat=True)[offset:offset + limit])
+
+        if project_ids is not None:
+            source += f" AND d.project_id IN ({', '.join(['%s'] * len(project_ids))})"
+            params += project_ids
+
+        with connection.cursor() as cursor:
+            cursor.execute(f"SELECT d.pole_id, d.body {source} ORDER BY {natural_order} LIMIT %s", [*params, SEARCH_RANK_CANDIDATES + 1])
+            candidates = cursor.fetchall()
+            if len(candidates) <= SEARCH_RANK_CANDIDATES:
+                def rank(row):
+                    words = set(search_words(row[1]))
+                    return (-sum(term in words for term in terms), len(row[1]), row[0])
+                candidates.sort(key=rank)
+            elif offset + limit > len(candidates):
+                cursor.execute(f"SELECT d.pole_id, d.body {source} ORDER BY {natural_order} LIMIT %s OFFSET %s", [*params, limit, offset])
+                return [row[0] for row in cursor.fetchall()]
+        return [row[0] for row in candidates[offset:offset + limit]]
+
+class PoleSearchDocument(models.Model):
+    pole = models.OneToOneField(Pole, on_delete=models.CASCADE, primary_key=True, related_name='search_document')
+    project = models.ForeignKey(Project, on_delete=models.CASCADE, related_name='+')
+    body = models.TextField()
+
+    objects = PoleSearchDocumentQuerySet.as_manager()
+
+    def __str__(self): return f"Search document for pole {self.pole_id}"
+
 class Evidence(models.Model):
+    STATUS_CHOICES = [('PROCESSING', 'Processing'), ('READY', 'Ready'), ('FAILED', 'Failed')]
     pole = models.ForeignKey(Pole, on_delete=models.CASCADE, related_name='evidence')
     stage = models.ForeignKey(StageDefinition, on_delete=models.PROTECT)
     image = CloudinaryField('image')
+    # Display-size copies of the watermarked image (see EVIDENCE_DERIVATIVE_SIZES)
+    thumbnail = models.FileField(upload_to='evidence/thumb/', blank=True, editable=False)
+    medium = models.FileField(upload_to='evidence/medium/', blank=True, editable=False)
     captured_at = models.DateTimeField(auto_now_add=True)
     gps_lat = models.DecimalField(max_digits=9, decimal_places=6, null=True, blank=True)
     gps_long = models.DecimalField(max_digits=9, decimal_places=6, null=True, blank=True)
+    # Reverse-geocoded once by the evidence worker and reused for the watermark
+    address = models.TextField(blank=True)
+    # PROCESSING until the EvidenceJob has watermarked and uploaded the photo
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='READY')
+
+    class Meta:
+        # Stage lookups on the pole page and the progress counters
+        indexes = [models.Index(fields=['pole', 'stage'], name='evidence_pole_stage_idx')]
+
+    def save(self, *args, **kwargs):
+        # Keeps the Pole progress counters (updated in post_save) in the same transaction
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
+    def delete_derivatives(self):
+        """Removes the stored thumbnail and medium files; the row is left as is."""
+        for file in (self.thumbnail, self.medium):
+            if file: file.delete(save=False)
+
     def __str__(self): return f"{self.pole.identifier} - {self.stage.name}"
 
+class EvidenceJob(models.Model):
+    """
+    Queued post-processing (EXIF, watermark, storage upload) for one Evidence
+    upload. The raw photo is kept here until a worker started with
+    `manage.py run_evidence_worker` claims the job; see tracker/jobs.py.
+    """
+    STATUS_CHOICES = [('PENDING', 'Pending'), ('RUNNING', 'Running'), ('DONE', 'Done'), ('FAILED', 'Failed')]
+    evidence = models.OneToOneField(Evidence, on_delete=models.CASCADE, related_name='job')
+    raw_image = models.BinaryField()
+    file_name = models.CharField(max_length=255)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='PENDING')
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['status', 'created_at'])]
+
+    def __str__(self): return f"Job for {self.evidence}: {self.status}"
+
+class GeocodeCache(models.Model):
+    """Reverse-geocoded addresses keyed on coordinates rounded to GEOCODE_PRECISION."""
+    key = models.CharField(max_length=50, unique=True, help_text="'lat,lon' rounded, e.g. '26.8467,80.9462'")
+    address = models.TextField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    def __str__(self): return f"{self.key}: {self.address}"
+
 class ProjectIssue(models.Model):
     STATUS_CHOICES = [('OPEN', 'Open'), ('RESOLVED', 'Resolved')]
     pole = models.ForeignKey(Pole, on_delete=models.CASCADE, related_name='issues')
@@ -107,21 +555,107 @@ class ProjectIssue(models.Model):
     message = models.TextField()
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='OPEN')
     created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        # Open-issue flag subquery in PoleQuerySet.with_progress and the client
+        # page; status first so project_detail can list the flagged poles from it
+        indexes = [models.Index(fields=['status', 'pole'], name='issue_status_pole_idx')]
+
     def __str__(self): return f"Issue on {self.pole.identifier}: {self.status}"
 
 # === NEW: PROJECT ACTIVITY LOG ===
+def log_date_bounds(start=None, end=None):
+    """Aware [from, to) timestamps for an inclusive start/end date range; None where open."""
+    return (
+        timezone.make_aware(datetime.combine(start, time.min)) if start else None,
+        timezone.make_aware(datetime.combine(end + timedelta(days=1), time.min)) if end else None,
+    )
+
+class ProjectLogQuerySet(models.QuerySet):
+    def matching(self, start=None, end=None, action='', user_id=None, system_only=False, stage_id=None, pole_id=None):
+        """
+        Audit filters shared by the log page, its JSON feed and the CSV export.
+        `start`/`end` are dates (both inclusive) applied as timestamp bounds;
+        `system_only` selects client/system entries. Every combination with an
+        action, user, stage or pole is read from one of the Meta indexes.
+        """
+        logs = self
+        start_at, end_at = log_date_bounds(start, end)
+        if start_at: logs = logs.filter(timestamp__gte=start_at)
+        if end_at: logs = logs.filter(timestamp__lt=end_at)
+        if action: logs = logs.filter(action=action)
+        if system_only: logs = logs.filter(user__isnull=True)
+        elif user_id is not None: logs = logs.filter(user_id=user_id)
+        if stage_id is not None: logs = logs.filter(stage_ref=stage_id)
+        if pole_id is not None: logs = logs.filter(pole_ref=pole_id)
+        return logs
+
 class ProjectLog(models.Model):
     project = models.ForeignKey(Project, on_delete=models.CASCADE, related_name='logs')
     user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True)
     action = models.CharField(max_length=50)  # e.g., "Created Item", "Uploaded Evidence"
     target = models.CharField(max_length=200) # e.g., "Pole #A1", "Project Settings"
     details = models.TextField(blank=True)    # Detailed info (Custom fields, changes)
+    # Structured details written by log_action(data=...): pole_id, stage_id,
+    # issue_id, field values. The ids used for filtering are copied into
+    # generated columns so they can be indexed the same way on every backend.
+    payload = models.JSONField(default=dict, blank=True)
+    stage_ref = models.GeneratedField(
+        expression=Cast(KT('payload__stage_id'), models.BigIntegerField()),
+        output_field=models.BigIntegerField(null=True), db_persist=True,
+    )
+    pole_ref = models.GeneratedField(
+        expression=Cast(KT('payload__pole_id'), models.BigIntegerField()),
+        output_field=models.BigIntegerField(null=True), db_persist=True,
+    )
     gps_lat = models.CharField(max_length=50, blank=True, null=True)
     gps_long = models.CharField(max_length=50, blank=True, null=True)
-    timestamp = models.DateTimeField(auto_now_add=True)
+    # Set when the action happens, not when the buffered entry is written (tracker/audit.py)
+    timestamp = models.DateTimeField(default=timezone.now, editable=False)
+
+    objects = ProjectLogQuerySet.as_manager()
 
     class Meta:
-        ordering = ['-timestamp']
+        # id breaks timestamp ties so keyset pages (see views.project_logs) are stable
+        ordering = ['-timestamp', '-id']
+        # A project's log newest-first, unfiltered or by action/user/stage/pole,
+        # read straight off an index without a sort
+        indexes = [
+            models.Index(fields=['project', '-timestamp', '-id'], name='projectlog_project_time_idx'),
+            models.Index(fields=['project', 'action', '-timestamp', '-id'], name='projectlog_project_action_idx'),
+            models.Index(fields=['project', 'user', '-timestamp', '-id'], name='projectlog_project_user_idx'),
+            models.Index(fields=['project', 'stage_ref', '-timestamp', '-id'], name='projectlog_project_stage_idx'),
+            models.Index(fields=['project', 'pole_ref', '-timestamp', '-id'], name='projectlog_project_pole_idx'),
+        ]
 
     def __str__(self):
-        return f"{self.project.name} - {self.action} - {self.timestamp}"
\ No newline at end of file
+        return f"{self.project.name} - {self.action} - {self.timestamp}"
+
+class ProjectLogArchiveQuerySet(models.QuerySet):
+    def overlapping(self, start=None, end=None):
+        """Archives that may hold entries in the inclusive start/end date range, newest first."""
+        start_at, end_at = log_date_bounds(start, end)
+        archives = self
+        if start_at: archives = archives.filter(newest_at__gte=start_at)
+        if end_at: archives = archives.filter(oldest_at__lt=end_at)
+        return archives.order_by('-newest_at', '-id')
+
+class ProjectLogArchive(models.Model):
+    """
+    A block of ProjectLog rows moved out of the table by `manage.py
+    archive_project_logs`: gzip-compressed JSON lines, newest first, covering
+    oldest_at..newest_at. See tracker/archive.py.
+    """
+    project = models.ForeignKey(Project, on_delete=models.CASCADE, related_name='log_archives')
+    file = models.FileField(upload_to='log_archives/', storage=RawMediaCloudinaryStorage())
+    oldest_at = models.DateTimeField()
+    newest_at = models.DateTimeField()
+    row_count = models.PositiveIntegerField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    objects = ProjectLogArchiveQuerySet.as_manager()
+
+    class Meta:
+        indexes = [models.Index(fields=['project', '-newest_at'], name='logarchive_project_newest_idx')]
+
+    def __str__(self): return f"{self.project.name}: {self.row_count} log entries ({self.oldest_at:%Y-%m-%d} - {self.newest_at:%Y-%m-%d})"
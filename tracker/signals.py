@@ -0,0 +1,98 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete, pre_delete, pre_save
+from django.dispatch import receiver
+from .models import Client, Project, ProjectType, StageDefinition, ItemFieldDefinition, Pole, ItemFieldValue, Evidence, ProjectIssue, PoleSearchDocument
+
+
+# ==========================================
+# 1. POLE PROGRESS COUNTERS
+# ==========================================
+# Only READY photos count. The evidence worker moves PROCESSING rows to READY
+# with an UPDATE and applies the change itself (see jobs.py).
+@receiver(pre_save, sender=Evidence)
+def evidence_saving(sender, instance, **kwargs):
+    old_status = Evidence.objects.filter(pk=instance.pk).values_list('status', flat=True).first() if instance.pk else None
+    instance._was_ready = old_status == 'READY'
+
+@receiver(post_save, sender=Evidence)
+def evidence_saved(sender, instance, **kwargs):
+    is_ready = instance.status == 'READY'
+    if is_ready and not instance._was_ready:
+        Pole.objects.apply_evidence_change(instance.pole_id, instance.stage, 1)
+    elif instance._was_ready and not is_ready:
+        Pole.objects.apply_evidence_change(instance.pole_id, instance.stage, -1)
+
+@receiver(post_delete, sender=Evidence)
+def evidence_deleted(sender, instance, **kwargs):
+    Pole.objects.apply_evidence_change(instance.pole_id, instance.stage, -1)
+
+
+# ==========================================
+# 2. CLIENT PAGE CACHE INVALIDATION
+# ==========================================
+# Any write that shows up on the public client pages moves the project's
+# content_version, so the next request renders under a fresh cache key.
+@receiver([post_save, post_delete], sender=Project)
+def project_changed(sender, instance, **kwargs):
+    Project.objects.filter(pk=instance.pk).bump_content_version()
+
+# pre_delete: Project.client is SET_NULL before post_delete runs
+@receiver([post_save, pre_delete], sender=Client)
+def client_changed(sender, instance, **kwargs):
+    Project.objects.filter(client_id=instance.pk).bump_content_version()
+
+@receiver([post_save, post_delete], sender=ProjectType)
+def project_type_changed(sender, instance, **kwargs):
+    Project.objects.filter(project_type_id=instance.pk).bump_content_version()
+
+@receiver([post_save, post_delete], sender=StageDefinition)
+def stage_changed(sender, instance, **kwargs):
+    Project.objects.filter(project_type_id=instance.project_type_id).bump_content_version()
+
+@receiver([post_save, post_delete], sender=ItemFieldDefinition)
+@receiver([post_save, post_delete], sender=Pole)
+def project_child_changed(sender, instance, **kwargs):
+    Project.objects.filter(pk=instance.project_id).bump_content_version()
+
+@receiver([post_save, post_delete], sender=ItemFieldValue)
+@receiver([post_save, post_delete], sender=Evidence)
+@receiver([post_save, post_delete], sender=ProjectIssue)
+def pole_child_changed(sender, instance, **kwargs):
+    Project.objects.filter(poles=instance.pole_id).bump_content_version()
+
+
+# ==========================================
+# 3. POLE SEARCH INDEX
+# ==========================================
+# Writes that bypass signals (bulk_create in create_project_item and the pole
+# importer) call PoleSearchDocument.objects.rebuild() themselves.
+@receiver(post_save, sender=Pole)
+def pole_saved(sender, instance, **kwargs):
+    PoleSearchDocument.objects.rebuild([instance.pk])
+
+@receiver([post_save, post_delete], sender=ItemFieldValue)
+def field_value_changed(sender, instance, origin=None, **kwargs):
+    # Nothing to re-index when the value goes away with its pole or project
+    if isinstance(origin, (Pole, Project)) or getattr(origin, 'model', None) in (Pole, Project):
+        return
+    PoleSearchDocument.objects.rebuild([instance.pole_id])
+
+@receiver(pre_save, sender=Project)
+def project_saving(sender, instance, **kwargs):
+    old_name = Project.objects.filter(pk=instance.pk).values_list('name', flat=True).first() if instance.pk else None
+    instance._search_name_changed = old_name is not None and old_name != instance.name
+
+@receiver(post_save, sender=Project)
+def project_saved(sender, instance, **kwargs):
+    if getattr(instance, '_search_name_changed', False):
+        PoleSearchDocument.objects.rebuild(instance.poles.all())
+
+
+# ==========================================
+# 4. STORED EVIDENCE FILES
+# ==========================================
+# Deleting or replacing a photo removes its thumbnail and medium copies once
+# the delete has committed, so a rolled-back delete keeps them.
+@receiver(post_delete, sender=Evidence)
+def evidence_files_deleted(sender, instance, **kwargs):
+    transaction.on_commit(instance.delete_derivatives)
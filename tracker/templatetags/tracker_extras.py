@@ -1,6 +1,22 @@
 from django import template
+from django.conf import settings
 register = template.Library()
 
 @register.filter
 def get_item(dictionary, key):
-    return dictionary.get(key)
\ No newline at end of file
+    return dictionary.get(key)
+
+@register.filter
+def evidence_url(evidence, size='medium'):
+    """URL of an evidence derivative ('thumbnail'/'medium'), falling back to the original."""
+    derivative = getattr(evidence, size, None)
+    return derivative.url if derivative else evidence.image.url
+
+@register.filter
+def evidence_srcset(evidence):
+    """srcset listing the stored derivatives, so the browser downloads the smallest that fits `sizes`."""
+    return ", ".join(
+        f"{getattr(evidence, name).url} {width}w"
+        for name, width in sorted(settings.EVIDENCE_DERIVATIVE_SIZES.items(), key=lambda item: item[1])
+        if getattr(evidence, name, None)
+    )
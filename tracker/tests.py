@@ -1,3 +1,827 @@
-from django.test import TestCase
+import os
+import re
+import shutil
+import tempfile
+import threading
+from io import BytesIO
+from unittest import mock
+import cloudinary
+from cloudinary import CloudinaryResource
+from PIL import Image
+from django.contrib import admin
+from django.contrib.messages import get_messages
+from django.core.cache import cache
+from django.core.files.storage import FileSystemStorage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import DatabaseError, connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from . import audit
+from .admin import ProjectIssueAdmin
+from .archive import archive_project_logs
+from .jobs import claim_next_job, enqueue_evidence, run_job
+from .importer import format_report, import_poles
+from .utils import make_image_derivatives
+from .views import POLES_PER_PAGE, _project_pole_streams, log_action
+from .models import ProjectType, StageDefinition, Project, Pole, Evidence, ItemFieldDefinition, ItemFieldValue, ProjectIssue, ProjectLog, ProjectLogArchive, PoleSearchDocument, User, Client
 
-# Create your tests here.
+# Evidence image URLs are built locally by the SDK; it only needs a cloud name.
+cloudinary.config(cloud_name='tracker-tests')
+
+def jpeg_upload(size=(1600, 1200)):
+    photo = BytesIO()
+    Image.new('RGB', size, 'orange').save(photo, format='JPEG')
+    return SimpleUploadedFile("photo.jpg", photo.getvalue(), content_type='image/jpeg')
+
+
+@override_settings(STATICFILES_STORAGE='django.contrib.staticfiles.storage.StaticFilesStorage')
+class ClientCityViewQueryTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        project_type = ProjectType.objects.create(name="Street Light")
+        cls.stages = [StageDefinition.objects.create(project_type=project_type, name=f"Stage {i}", order=i) for i in range(3)]
+        cls.project = Project.objects.create(name="Lucknow", project_type=project_type)
+        cls.village = ItemFieldDefinition.objects.create(project=cls.project, label="Village", is_grouping_key=True)
+        cls.scheme = ItemFieldDefinition.objects.create(project=cls.project, label="Scheme")
+
+    def setUp(self):
+        cache.clear()
+
+    def add_poles(self, count):
+        for i in range(count):
+            pole = Pole.objects.create(project=self.project, identifier=f"P{Pole.objects.count()}")
+            ItemFieldValue.objects.create(pole=pole, field_def=self.village, value=f"Village {i % 3}")
+            ItemFieldValue.objects.create(pole=pole, field_def=self.scheme, value="Scheme A")
+            for stage in self.stages[:i % 3]:
+                Evidence.objects.create(pole=pole, stage=stage, image="sample")
+            if i % 4 == 0:
+                ProjectIssue.objects.create(pole=pole, message="Blurry photo")
+
+    def get_page(self):
+        return self.client.get(reverse('client_view', args=[self.project.client_uuid]), secure=True)
+
+    def test_query_count_does_not_grow_with_poles(self):
+        self.add_poles(3)
+        with self.assertNumQueries(5):
+            self.get_page()
+        self.add_poles(20)
+        with self.assertNumQueries(5):
+            response = self.get_page()
+        self.assertEqual(response.status_code, 200)
+
+    def test_repeat_views_are_served_from_cache(self):
+        self.add_poles(3)
+        first = self.get_page()
+        with self.assertNumQueries(1):
+            second = self.get_page()
+        self.assertEqual(first.context['page_content'], second.context['page_content'])
+
+    def test_writes_invalidate_cached_page(self):
+        self.add_poles(3)
+        self.get_page()
+        Pole.objects.filter(identifier="P0").get().issues.all().delete()
+        ItemFieldValue.objects.filter(value="Village 0").update(value="Renamed")
+        ItemFieldValue.objects.filter(value="Renamed").first().save()
+        self.assertContains(self.get_page(), "Renamed")
+
+    def test_client_and_type_changes_invalidate_cached_pages(self):
+        client = Client.objects.create(name="UP Government")
+        self.project.client = client
+        self.project.save()
+        version = lambda: Project.objects.get(pk=self.project.pk).content_version
+        dashboard = lambda: self.client.get(reverse('client_dashboard', args=[client.uuid]), secure=True)
+        dashboard()
+
+        before = version()
+        client.name = "Adani Power"
+        client.save()
+        self.assertNotEqual(version(), before)
+        self.assertContains(dashboard(), "Adani Power")
+
+        before = version()
+        self.project.project_type.name = "Solar Pump"
+        self.project.project_type.save()
+        self.assertNotEqual(version(), before)
+        self.assertContains(dashboard(), "Solar Pump")
+
+        before = version()
+        client.delete()
+        self.assertNotEqual(version(), before)
+
+    def test_client_without_projects_is_renamed_on_its_page(self):
+        client = Client.objects.create(name="UP Government")
+        url = reverse('client_dashboard', args=[client.uuid])
+        self.client.get(url, secure=True)
+        client.name = "Adani Power"
+        client.save()
+        self.assertContains(self.client.get(url, secure=True), "Adani Power")
+
+    def test_resolving_issues_in_admin_invalidates_cached_page(self):
+        self.add_poles(3)
+        self.get_page()
+        ProjectIssueAdmin(ProjectIssue, admin.site).mark_resolved(None, ProjectIssue.objects.all())
+        with self.assertNumQueries(5):
+            grouped = self.get_page().context['grouped_data']
+        self.assertFalse(any(pole['has_issue'] for group in grouped.values() for pole in group['poles']))
+
+    def test_groups_by_village_in_memory(self):
+        self.add_poles(6)
+        grouped = self.get_page().context['grouped_data']
+        self.assertEqual(list(grouped), ["Village 0", "Village 1", "Village 2"])
+        self.assertEqual(grouped["Village 0"]['total'], 2)
+        first = grouped["Village 0"]['poles'][0]
+        self.assertTrue(first['has_issue'])
+        self.assertEqual([v.value for v in first['custom_data']], ["Village 0", "Scheme A"])
+        self.assertEqual(len(grouped["Village 2"]['poles'][0]['history']), 2)
+
+    def test_without_grouping_key_uses_single_group(self):
+        self.village.is_grouping_key = False
+        self.village.save()
+        self.add_poles(4)
+        grouped = self.get_page().context['grouped_data']
+        self.assertEqual(list(grouped), ["All Locations"])
+        self.assertEqual(grouped["All Locations"]['total'], 4)
+
+
+class QueryPlanTests(TestCase):
+    """
+    EXPLAIN checks for the hot view queries: each must be answered from an
+    index, never by a full scan of the table.
+    """
+    POLES = 600
+
+    @classmethod
+    def setUpTestData(cls):
+        project_type = ProjectType.objects.create(name="Street Light")
+        cls.stages = [StageDefinition.objects.create(project_type=project_type, name=f"Stage {i}", order=i) for i in range(4)]
+        cls.projects = [Project.objects.create(name=f"City {i}", project_type=project_type) for i in range(3)]
+        cls.project = cls.projects[0]
+        cls.village = ItemFieldDefinition.objects.create(project=cls.project, label="Village", is_grouping_key=True)
+        for project in cls.projects:
+            Pole.objects.bulk_create(
+                Pole(project=project, identifier=f"Pole #{i}", custom_id=f"{project.pk}-{i}") for i in range(cls.POLES)
+            )
+        poles = list(Pole.objects.filter(project=cls.project))
+        cls.pole = poles[0]
+        ItemFieldValue.objects.bulk_create(
+            ItemFieldValue(pole=pole, field_def=cls.village, value=f"Village {i % 40}") for i, pole in enumerate(poles)
+        )
+        Evidence.objects.bulk_create(
+            Evidence(pole=pole, stage=stage, image="sample") for i, pole in enumerate(poles) for stage in cls.stages[:i % 5]
+        )
+        ProjectIssue.objects.bulk_create(
+            ProjectIssue(pole=pole, message="Blurry photo", status='OPEN' if i % 3 else 'RESOLVED')
+            for i, pole in enumerate(poles) if i % 7 == 0
+        )
+        ProjectLog.objects.bulk_create(
+            ProjectLog(project=project, action="Created Item", target=f"Pole #{i}", payload={'pole_id': i, 'stage_id': i % 4})
+            for project in cls.projects for i in range(cls.POLES)
+        )
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
+
+    def setUp(self):
+        if connection.vendor == 'postgresql':
+            # Test-sized tables are cheap to scan; make the planner show which index it would use
+            with connection.cursor() as cursor:
+                cursor.execute("SET LOCAL enable_seqscan = off")
+
+    def assertUsesIndex(self, queryset, table, index_name):
+        plan = queryset.explain()
+        self.assertIsNone(re.search(rf"\bSCAN {table}\b|Seq Scan on {table}\b", plan), plan)
+        self.assertIn(index_name, plan)
+        return plan
+
+    def test_pole_stage_evidence(self):
+        self.assertUsesIndex(
+            Evidence.objects.filter(pole=self.pole, stage=self.stages[1]), 'tracker_evidence', 'evidence_pole_stage_idx'
+        )
+
+    def test_open_issue_flag(self):
+        plan = self.assertUsesIndex(
+            self.project.poles.with_progress(), 'tracker_projectissue', 'issue_status_pole_idx'
+        )
+        self.assertIsNone(re.search(r"\bSCAN tracker_pole\b|Seq Scan on tracker_pole\b", plan), plan)
+
+    def test_field_value_lookup(self):
+        self.assertUsesIndex(
+            ItemFieldValue.objects.filter(field_def=self.village, value="Village 3"),
+            'tracker_itemfieldvalue', 'fieldvalue_def_value_idx',
+        )
+
+    def test_pole_by_identifier(self):
+        self.assertUsesIndex(
+            self.project.poles.filter(identifier="Pole #42"), 'tracker_pole', 'pole_project_identifier_idx'
+        )
+
+    def test_project_pole_pages_without_sort(self):
+        flagged, unflagged = _project_pole_streams(self.project)
+        for page in (flagged.filter(id__gt=self.pole.pk)[:51], unflagged.filter(id__gt=self.pole.pk)[:51]):
+            plan = self.assertUsesIndex(page, 'tracker_pole', 'issue_status_pole_idx')
+            self.assertNotIn("TEMP B-TREE", plan)
+
+    def test_project_log_newest_first_without_sort(self):
+        plan = self.assertUsesIndex(self.project.logs.all()[:50], 'tracker_projectlog', 'projectlog_project_time_idx')
+        self.assertNotIn("TEMP B-TREE", plan)
+        self.assertNotRegex(plan, r"(?m)^\s*(->\s*)?(Incremental )?Sort\b")
+
+    def test_project_log_keyset_pages_by_action_and_user(self):
+        now = timezone.now()
+        page = Q(timestamp__lt=now) | Q(id__lt=500)
+        for logs, index_name in (
+            (self.project.logs.filter(action="Created Item"), 'projectlog_project_action_idx'),
+            (self.project.logs.filter(user__isnull=True), 'projectlog_project_user_idx'),
+        ):
+            plan = self.assertUsesIndex(logs.filter(page, timestamp__lte=now)[:101], 'tracker_projectlog', index_name)
+            self.assertNotIn("TEMP B-TREE", plan)
+
+    def test_project_log_by_stage_and_pole(self):
+        for logs, index_name in (
+            (self.project.logs.matching(stage_id=self.stages[2].pk), 'projectlog_project_stage_idx'),
+            (self.project.logs.matching(pole_id=self.pole.pk), 'projectlog_project_pole_idx'),
+        ):
+            plan = self.assertUsesIndex(logs[:101], 'tracker_projectlog', index_name)
+            self.assertNotIn("TEMP B-TREE", plan)
+
+
+@override_settings(
+    STATICFILES_STORAGE='django.contrib.staticfiles.storage.StaticFilesStorage',
+    EVIDENCE_ASYNC_PROCESSING=True,
+)
+class PoleDetailStageLockTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def make_pole(self, stage_count, done):
+        project_type = ProjectType.objects.create(name=f"Type {stage_count}")
+        stages = [StageDefinition.objects.create(project_type=project_type, name=f"Stage {i}", order=i) for i in range(stage_count)]
+        project = Project.objects.create(name="Lucknow", project_type=project_type)
+        pole = Pole.objects.create(project=project, identifier=f"P{stage_count}")
+        for stage in stages[:done]:
+            Evidence.objects.create(pole=pole, stage=stage, image="sample")
+        return pole, stages
+
+    def upload(self, pole, stage):
+        return self.client.post(reverse('pole_detail', args=[pole.id]), {
+            'stage_id': stage.id, 'image': SimpleUploadedFile("photo.jpg", b"raw-bytes", content_type='image/jpeg'),
+        }, secure=True)
+
+    def count_queries(self, request):
+        with CaptureQueriesContext(connection) as queries:
+            request()
+        return len(queries)
+
+    def test_page_queries_do_not_grow_with_stages(self):
+        small, _ = self.make_pole(3, done=2)
+        large, _ = self.make_pole(12, done=9)
+        url = lambda pole: reverse('pole_detail', args=[pole.id])
+        self.assertEqual(
+            self.count_queries(lambda: self.client.get(url(small), secure=True)),
+            self.count_queries(lambda: self.client.get(url(large), secure=True)),
+        )
+
+    def test_lock_state_matches_completed_stages(self):
+        pole, stages = self.make_pole(4, done=1)
+        Evidence.objects.create(pole=pole, stage=stages[2], image="sample")
+        shown = self.client.get(reverse('pole_detail', args=[pole.id]), secure=True).context['stages']
+        self.assertEqual([(s.is_done, s.is_locked) for s in shown], [(True, False), (False, False), (True, True), (False, True)])
+
+    def test_failed_photo_keeps_later_stages_locked(self):
+        pole, stages = self.make_pole(3, done=0)
+        Evidence.objects.create(pole=pole, stage=stages[0], image="sample", status='FAILED')
+        Evidence.objects.create(pole=pole, stage=stages[1], image="sample", status='PROCESSING')
+        response = self.client.get(reverse('pole_detail', args=[pole.id]), secure=True)
+        self.assertEqual([(s.is_done, s.is_locked) for s in response.context['stages']], [(False, False), (True, True), (False, True)])
+        self.assertContains(response, "Upload Failed")
+
+        response = self.upload(pole, stages[2])
+        self.assertFalse(pole.evidence.filter(stage=stages[2]).exists())
+        self.assertIn("Stage 0", str(list(get_messages(response.wsgi_request))[0]))
+
+        # Uploading the failed stage again replaces its photo and unlocks the next one
+        self.upload(pole, stages[0])
+        shown = self.client.get(reverse('pole_detail', args=[pole.id]), secure=True).context['stages']
+        self.assertEqual([(s.is_done, s.is_locked) for s in shown], [(True, False), (True, False), (False, False)])
+
+    def test_upload_skipping_a_stage_is_refused(self):
+        pole, stages = self.make_pole(4, done=1)
+        response = self.upload(pole, stages[3])
+        self.assertFalse(pole.evidence.filter(stage=stages[3]).exists())
+        self.assertIn("Stage 1, Stage 2", str(list(get_messages(response.wsgi_request))[0]))
+
+    def test_stage_of_another_project_type_is_refused(self):
+        pole, _ = self.make_pole(2, done=0)
+        _, other_stages = self.make_pole(2, done=0)
+        self.upload(pole, other_stages[0])
+        self.assertFalse(pole.evidence.exists())
+
+    def test_upload_queries_do_not_grow_with_stages(self):
+        small, small_stages = self.make_pole(3, done=2)
+        large, large_stages = self.make_pole(12, done=11)
+        self.assertEqual(
+            self.count_queries(lambda: self.upload(small, small_stages[-1])),
+            self.count_queries(lambda: self.upload(large, large_stages[-1])),
+        )
+        # Re-uploading a done stage replaces its photo
+        self.assertEqual(
+            self.count_queries(lambda: self.upload(small, small_stages[0])),
+            self.count_queries(lambda: self.upload(large, large_stages[0])),
+        )
+        self.assertEqual(large.evidence.filter(stage=large_stages[0]).count(), 1)
+        self.assertEqual(large.evidence.get(stage=large_stages[0]).status, 'PROCESSING')
+        # The new uploads count once they have been processed
+        large.refresh_from_db()
+        self.assertEqual(large.stages_done, 10)
+
+
+class PoleSearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        project_type = ProjectType.objects.create(name="Street Light")
+        cls.project = Project.objects.create(name="Lucknow", project_type=project_type)
+        cls.other = Project.objects.create(name="Kanpur", project_type=project_type)
+        cls.village = ItemFieldDefinition.objects.create(project=cls.project, label="Village", is_grouping_key=True)
+        cls.pole = Pole.objects.create(project=cls.project, identifier="Pole 1")
+        cls.value = ItemFieldValue.objects.create(pole=cls.pole, field_def=cls.village, value="Rampur")
+        cls.longer = Pole.objects.create(project=cls.project, identifier="Pole 2 near Rampur Khas market")
+        cls.elsewhere = Pole.objects.create(project=cls.other, identifier="Rampur gate")
+
+    def search(self, query, project_ids=None):
+        return PoleSearchDocument.objects.search(query, project_ids=project_ids)
+
+    def test_prefix_terms_rank_and_project_filter(self):
+        self.assertEqual(sorted(self.search("ramp")), [self.pole.pk, self.longer.pk, self.elsewhere.pk])
+        # Whole-word hits first, then shorter documents
+        self.assertEqual(self.search("rampur pole"), [self.pole.pk, self.longer.pk])
+        self.assertEqual(self.search("RAMPUR lucknow"), [self.pole.pk, self.longer.pk])
+        self.assertEqual(self.search("rampur", project_ids=[self.other.pk]), [self.elsewhere.pk])
+        self.assertEqual(self.search(self.pole.custom_id), [self.pole.pk])
+        self.assertEqual(self.search("#_ "), [])
+
+    def test_documents_follow_edits(self):
+        self.value.value = "Sitapur"
+        self.value.save()
+        self.assertNotIn(self.pole.pk, self.search("rampur"))
+        self.assertEqual(self.search("sitapur"), [self.pole.pk])
+
+        self.project.name = "Lucknow North"
+        self.project.save()
+        self.assertEqual(self.search("north"), [self.pole.pk, self.longer.pk])
+
+        self.pole.delete()
+        self.assertEqual(self.search("sitapur"), [])
+        self.assertFalse(PoleSearchDocument.objects.filter(pole_id=self.value.pole_id).exists())
+
+
+class PoleImportTests(TestCase):
+    def setUp(self):
+        data_file = Project._meta.get_field('data_file')
+        self.addCleanup(setattr, data_file, 'storage', data_file.storage)
+        data_file.storage = FileSystemStorage(location=tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, data_file.storage.location)
+
+        project_type = ProjectType.objects.create(name="Street Light")
+        rows = "".join(f"Village {i % 2},Scheme A\n" for i in range(10))
+        self.project = Project.objects.create(
+            name="Lucknow", project_type=project_type,
+            data_file=SimpleUploadedFile("poles.csv", f"Village,Scheme\n{rows},\n".encode()),
+        )
+        ItemFieldDefinition.objects.create(project=self.project, label="Village", excel_column="Village", is_grouping_key=True)
+        ItemFieldDefinition.objects.create(project=self.project, label="Scheme", excel_column="Scheme")
+
+    def test_rows_with_repeated_values_each_create_a_pole(self):
+        preview = import_poles(self.project, dry_run=True)
+        self.assertEqual((preview['rows'], preview['created'], preview['blank']), (11, 10, 1))
+        self.assertFalse(self.project.poles.exists())
+
+        report = import_poles(self.project)
+        self.assertIn("Created 10 of 11 rows (1 blank).", format_report(report))
+        self.assertEqual(report['groups'], {"Village 0": 5, "Village 1": 5})
+        self.assertEqual(report['samples'], preview['samples'])
+        self.assertEqual(self.project.poles.count(), 10)
+        self.assertEqual(len(set(self.project.poles.values_list('identifier', flat=True))), 10)
+        self.assertEqual(ItemFieldValue.objects.filter(pole__project=self.project, value="Scheme A").count(), 10)
+
+
+class EvidenceJobTests(TestCase):
+    def setUp(self):
+        storage = FileSystemStorage(location=tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, storage.location)
+        for name in ('thumbnail', 'medium'):
+            field = Evidence._meta.get_field(name)
+            self.addCleanup(setattr, field, 'storage', field.storage)
+            field.storage = storage
+        self.storage = storage
+        # The processed photo would go to Cloudinary
+        upload = mock.patch('cloudinary.uploader.upload_resource', return_value=CloudinaryResource(
+            'evidence/photo', format='jpg', version=1, type='upload', resource_type='image',
+        ))
+        upload.start()
+        self.addCleanup(upload.stop)
+
+        project_type = ProjectType.objects.create(name="Street Light")
+        self.stage = StageDefinition.objects.create(project_type=project_type, name="Pit", order=0)
+        project = Project.objects.create(name="Lucknow", project_type=project_type)
+        self.pole = Pole.objects.create(project=project, identifier="P1")
+
+    def enqueue(self):
+        evidence = Evidence(pole=self.pole, stage=self.stage)
+        enqueue_evidence(evidence, jpeg_upload())
+        return evidence, claim_next_job()
+
+    def stored_files(self):
+        return sorted(name for folder in ('evidence/thumb', 'evidence/medium') if self.storage.exists(folder) for name in self.storage.listdir(folder)[1])
+
+    def test_processed_photo_is_stored_with_derivatives(self):
+        evidence, job = self.enqueue()
+        self.assertTrue(run_job(job))
+        evidence.refresh_from_db()
+        self.assertEqual(evidence.status, 'READY')
+        self.assertEqual(evidence.image.public_id, 'evidence/photo')
+        self.assertEqual(self.stored_files(), ['photo_medium.jpg', 'photo_thumbnail.jpg'])
+        with Image.open(evidence.thumbnail.open('rb')) as thumbnail:
+            self.assertEqual(thumbnail.size, (320, 240))
+        with Image.open(evidence.medium.open('rb')) as medium:
+            self.assertEqual(medium.size, (1280, 960))
+
+    def test_photo_deleted_while_processing_is_not_saved_back(self):
+        evidence, job = self.enqueue()
+        Evidence.objects.filter(pk=evidence.pk).delete()
+        with mock.patch('cloudinary.uploader.destroy') as destroy:
+            run_job(job)
+        self.assertFalse(Evidence.objects.filter(pk=evidence.pk).exists())
+        self.assertEqual(self.stored_files(), [])
+        destroy.assert_called_once_with('evidence/photo', invalidate=True)
+        self.pole.refresh_from_db()
+        self.assertEqual(self.pole.stages_done, 0)
+
+    def test_derivatives_are_deleted_with_their_photo(self):
+        evidence, job = self.enqueue()
+        run_job(job)
+        _, job = self.enqueue()
+        run_job(job)
+        self.assertEqual(len(self.storage.listdir('evidence/thumb')[1]), 2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Evidence.objects.get(pk=evidence.pk).delete()
+        self.assertEqual(len(self.stored_files()), 2)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.pole.delete()
+        self.assertEqual(self.stored_files(), [])
+
+    def test_status_updates_invalidate_client_pages(self):
+        version = lambda: Project.objects.values_list('content_version', flat=True).get(pk=self.pole.project_id)
+        _, job = self.enqueue()
+        before = version()
+        run_job(job)
+        self.assertNotEqual(version(), before)
+
+        evidence, job = self.enqueue()
+        before = version()
+        with override_settings(EVIDENCE_JOB_MAX_ATTEMPTS=1), self.assertLogs('tracker.jobs', 'ERROR'), \
+                mock.patch('tracker.jobs.watermark_image', side_effect=OSError("truncated file")):
+            self.assertFalse(run_job(job))
+        self.assertEqual(Evidence.objects.get(pk=evidence.pk).status, 'FAILED')
+        self.assertNotEqual(version(), before)
+
+    def test_derivatives_keep_aspect_ratio_and_never_upscale(self):
+        photo = jpeg_upload((2000, 900))
+        derivatives = make_image_derivatives(photo)
+        self.assertEqual(photo.tell(), 0)
+        sizes = {}
+        for name, content in derivatives.items():
+            with Image.open(content) as image:
+                sizes[name] = (image.format, image.size)
+        self.assertEqual(sizes, {'thumbnail': ('JPEG', (320, 144)), 'medium': ('JPEG', (1280, 576))})
+
+        small = Image.new('RGB', (300, 200), 'orange')
+        with Image.open(make_image_derivatives(small)['medium']) as medium:
+            self.assertEqual(medium.size, (300, 200))
+        self.assertEqual(small.size, (300, 200))
+
+
+class PoleProgressCounterTests(TestCase):
+    COUNTERS = ('stages_done', 'required_stages_done', 'is_completed', 'last_evidence_at')
+
+    @classmethod
+    def setUpTestData(cls):
+        project_type = ProjectType.objects.create(name="Street Light")
+        cls.stages = [StageDefinition.objects.create(project_type=project_type, name=f"Stage {i}", order=i) for i in range(3)]
+        cls.optional = StageDefinition.objects.create(project_type=project_type, name="Extra", order=3, is_required=False)
+        cls.project = Project.objects.create(name="Lucknow", project_type=project_type)
+
+    def setUp(self):
+        self.pole = Pole.objects.create(project=self.project, identifier="P1")
+
+    def counters(self, pole=None):
+        return Pole.objects.filter(pk=(pole or self.pole).pk).values_list(*self.COUNTERS).get()
+
+    def add(self, stage, status='READY', pole=None):
+        return Evidence.objects.create(pole=pole or self.pole, stage=stage, image="sample", status=status)
+
+    def assertMatchesRebuild(self):
+        incremental = self.counters()
+        Pole.objects.filter(pk=self.pole.pk).update(stages_done=0, required_stages_done=0, is_completed=False, last_evidence_at=None)
+        Pole.objects.filter(pk=self.pole.pk).rebuild_progress()
+        self.assertEqual(self.counters(), incremental)
+
+    def test_only_ready_photos_count(self):
+        first = self.add(self.stages[0])
+        self.add(self.stages[0])
+        self.add(self.optional)
+        pending = self.add(self.stages[1], status='PROCESSING')
+        self.add(self.stages[2], status='FAILED')
+        self.assertEqual(self.counters()[:3], (2, 1, False))
+        self.assertEqual(self.counters()[3], Evidence.objects.filter(status='READY').latest('captured_at').captured_at)
+        self.assertMatchesRebuild()
+
+        pending.status = 'READY'
+        pending.save()
+        self.assertEqual(self.counters()[:3], (3, 2, False))
+        self.assertMatchesRebuild()
+
+        first.status = 'FAILED'
+        first.save()
+        self.assertEqual(self.counters()[:3], (3, 2, False))
+        self.assertMatchesRebuild()
+
+    def test_completion_follows_required_stages(self):
+        for stage in self.stages:
+            self.add(stage)
+        self.assertEqual(self.counters()[:3], (3, 3, True))
+        self.assertMatchesRebuild()
+
+        self.pole.evidence.filter(stage=self.stages[1]).delete()
+        self.assertEqual(self.counters()[:3], (2, 2, False))
+        self.assertMatchesRebuild()
+
+    def test_type_without_required_stages_completes_with_a_photo(self):
+        project_type = ProjectType.objects.create(name="Survey")
+        stage = StageDefinition.objects.create(project_type=project_type, name="Site", order=0, is_required=False)
+        project = Project.objects.create(name="Kanpur", project_type=project_type)
+        empty, pole = (Pole.objects.create(project=project, identifier=f"S{i}") for i in range(2))
+        photo = self.add(stage, pole=pole)
+        self.assertEqual(self.counters(pole)[:3], (1, 0, True))
+
+        Pole.objects.filter(project=project).rebuild_progress()
+        self.assertEqual(self.counters(empty)[:3], (0, 0, False))
+        self.assertEqual(self.counters(pole)[:3], (1, 0, True))
+        self.assertEqual(Project.objects.with_stats().get(pk=project.pk).pole_done, 1)
+
+        photo.delete()
+        self.assertEqual(self.counters(pole)[:3], (0, 0, False))
+
+    def test_deletes_recount_from_remaining_ready_photos(self):
+        kept = self.add(self.stages[0])
+        extra = self.add(self.stages[0])
+        self.add(self.stages[1], status='PROCESSING')
+        extra.delete()
+        self.assertEqual(self.counters()[:3], (1, 1, False))
+        self.assertMatchesRebuild()
+
+        # Queryset delete: every post_delete runs after all rows are gone
+        self.pole.evidence.all().delete()
+        self.assertEqual(self.counters(), (0, 0, False, None))
+        self.assertMatchesRebuild()
+        self.assertFalse(Evidence.objects.filter(pk=kept.pk).exists())
+
+    def test_rebuild_invalidates_client_pages(self):
+        before = Project.objects.get(pk=self.project.pk).content_version
+        Pole.objects.filter(pk=self.pole.pk).rebuild_progress()
+        self.assertNotEqual(Project.objects.get(pk=self.project.pk).content_version, before)
+
+    def test_cascade_delete_leaves_other_poles_alone(self):
+        other = Pole.objects.create(project=self.project, identifier="P2")
+        for stage in self.stages:
+            self.add(stage)
+            self.add(stage, pole=other)
+        before = self.counters(other)
+        self.pole.delete()
+        self.assertEqual(self.counters(other), before)
+        self.assertEqual(Evidence.objects.filter(pole=other).count(), 3)
+        self.project.delete()
+        self.assertFalse(Evidence.objects.exists())
+
+    def test_processed_upload_counts_once_ready(self):
+        evidence = Evidence(pole=self.pole, stage=self.stages[0])
+        with mock.patch('cloudinary.uploader.upload_resource', return_value=CloudinaryResource(
+            'evidence/photo', format='jpg', version=1, type='upload', resource_type='image',
+        )), mock.patch('tracker.jobs.make_image_derivatives', return_value={}):
+            enqueue_evidence(evidence, jpeg_upload((64, 48)))
+            self.assertEqual(self.counters()[:3], (0, 0, False))
+            self.assertTrue(run_job(claim_next_job()))
+        self.assertEqual(self.counters()[:3], (1, 1, False))
+        self.assertMatchesRebuild()
+
+
+@override_settings(AUDIT_FLUSH_SIZE=100, AUDIT_FLUSH_INTERVAL=60, AUDIT_BUFFER_LIMIT=5)
+class AuditBufferTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        project_type = ProjectType.objects.create(name="Street Light")
+        cls.project = Project.objects.create(name="Lucknow", project_type=project_type)
+
+    def setUp(self):
+        self.buffer = audit.AuditBuffer()
+        self.addCleanup(self.buffer._pending.clear)
+
+    def entry(self, target="Pole #1"):
+        return ProjectLog(project=self.project, action="Created Item", target=target)
+
+    def fill(self, *targets):
+        # Without the writer thread, so only the test flushes
+        with mock.patch.object(audit.AuditBuffer, '_ensure_writer'):
+            for target in targets:
+                self.buffer.add(self.entry(target))
+
+    def test_flush_writes_queued_entries_in_one_batch(self):
+        self.fill("Pole #1", "Pole #2", "Pole #3")
+        self.assertEqual(self.buffer.stats()['pending'], 3)
+        with self.assertNumQueries(1):
+            self.assertEqual(self.buffer.flush(), 3)
+        self.assertEqual(self.buffer.flush(), 0)
+        self.assertEqual(ProjectLog.objects.count(), 3)
+        stats = self.buffer.stats()
+        self.assertEqual(
+            {key: stats[key] for key in ('queued', 'written', 'dropped', 'flushes', 'failures', 'max_batch', 'pending')},
+            {'queued': 3, 'written': 3, 'dropped': 0, 'flushes': 1, 'failures': 0, 'max_batch': 3, 'pending': 0},
+        )
+        self.assertEqual(stats['mean_flush_seconds'], stats['flush_seconds'])
+
+    def test_failed_flush_retries_newest_entries_up_to_the_limit(self):
+        self.fill("Pole #1", "Pole #2", "Pole #3")
+        with mock.patch.object(ProjectLog.objects, 'bulk_create', side_effect=DatabaseError("database is down")), \
+                self.assertLogs('tracker.audit', 'ERROR'):
+            self.assertEqual(self.buffer.flush(), 0)
+            self.assertEqual(self.buffer.stats()['pending'], 3)
+            self.fill("Pole #4", "Pole #5", "Pole #6", "Pole #7")
+            self.assertEqual(self.buffer.flush(), 0)
+        stats = self.buffer.stats()
+        self.assertEqual((stats['failures'], stats['dropped'], stats['pending'], stats['written']), (2, 2, 5, 0))
+
+        self.assertEqual(self.buffer.flush(), 5)
+        self.assertEqual(sorted(ProjectLog.objects.values_list('target', flat=True)), [f"Pole #{i}" for i in range(3, 8)])
+        self.assertEqual(self.buffer.stats()['written'], 5)
+
+    def test_writer_thread_flushes_a_full_batch(self):
+        flushed = threading.Event()
+        def fake_flush():
+            self.buffer._pending.clear()
+            flushed.set()
+        with override_settings(AUDIT_FLUSH_SIZE=2), mock.patch.object(self.buffer, 'flush', side_effect=fake_flush):
+            self.buffer.add(self.entry())
+            self.assertTrue(self.buffer._thread.is_alive())
+            self.assertFalse(flushed.wait(0.2))
+            self.buffer.add(self.entry())
+            self.assertTrue(flushed.wait(5))
+
+    def test_forked_process_starts_its_own_writer(self):
+        self.buffer.add(self.entry("Parent"))
+        parent_thread = self.buffer._thread
+        # A forked child inherits the parent's pid, thread object and queue
+        self.buffer._pid = -1
+        self.buffer.add(self.entry("Child"))
+        self.assertEqual(self.buffer._pid, os.getpid())
+        self.assertIsNot(self.buffer._thread, parent_thread)
+        self.assertTrue(self.buffer._thread.is_alive())
+        self.assertEqual([entry.target for entry in self.buffer._pending], ["Child"])
+
+    def test_exit_hook_flushes_the_process_buffer(self):
+        with mock.patch.object(audit, 'buffer', self.buffer), mock.patch.object(audit, 'connection') as audit_connection:
+            self.fill("Pole #1")
+            audit._flush_at_exit()
+        self.assertTrue(ProjectLog.objects.filter(target="Pole #1").exists())
+        audit_connection.close.assert_called_once_with()
+
+    def test_record_buffers_or_saves_inline_after_commit(self):
+        with mock.patch.object(audit, 'buffer', self.buffer), mock.patch.object(audit.AuditBuffer, '_ensure_writer'):
+            with override_settings(AUDIT_BUFFERED=True), self.captureOnCommitCallbacks(execute=True):
+                log_action(self.project, None, "Created Item", "Pole #1", data={'pole_id': 1})
+                self.assertEqual(self.buffer._pending, [])
+            self.assertFalse(ProjectLog.objects.exists())
+            self.assertEqual(self.buffer._pending[0].payload, {'pole_id': 1})
+
+            with override_settings(AUDIT_BUFFERED=False), self.captureOnCommitCallbacks(execute=True):
+                log_action(self.project, None, "Created Item", "Pole #2")
+            self.assertTrue(ProjectLog.objects.filter(target="Pole #2").exists())
+
+    def test_rolled_back_action_is_not_logged(self):
+        with mock.patch.object(audit, 'buffer', self.buffer), mock.patch.object(audit.AuditBuffer, '_ensure_writer'), \
+                override_settings(AUDIT_BUFFERED=True), self.captureOnCommitCallbacks(execute=True) as callbacks:
+            with self.assertRaises(DatabaseError), transaction.atomic():
+                log_action(self.project, None, "Uploaded Evidence", "Pole #1")
+                raise DatabaseError("commit failed")
+        self.assertEqual(callbacks, [])
+        self.assertEqual(self.buffer.stats()['queued'], 0)
+        self.assertEqual(self.buffer.flush(), 0)
+        self.assertFalse(ProjectLog.objects.exists())
+
+
+@override_settings(AUDIT_BUFFERED=False)
+class ProjectLogArchiveTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        project_type = ProjectType.objects.create(name="Street Light")
+        cls.project = Project.objects.create(name="Lucknow", project_type=project_type)
+        other = Project.objects.create(name="Kanpur", project_type=project_type)
+        start = timezone.now() - timezone.timedelta(days=30)
+        ProjectLog.objects.bulk_create([
+            ProjectLog(
+                project=cls.project, user=cls.user if i % 3 else None, timestamp=start + timezone.timedelta(hours=7 * i),
+                action="Uploaded Evidence" if i % 2 else "Created Item", target=f"Pole #{i % 5}", details=f"Entry {i}, \"quoted\"",
+                payload={'pole_id': i % 5, 'stage_id': i % 4} if i % 4 else {}, gps_lat="26.8467" if i % 2 else None,
+            )
+            for i in range(40)
+        ] + [ProjectLog(project=other, action="Created Item", target="Pole #0", timestamp=start)])
+        cls.cutoff = start + timezone.timedelta(hours=7 * 25)
+
+    def setUp(self):
+        self.client.force_login(self.user)
+        archive_file = ProjectLogArchive._meta.get_field('file')
+        self.addCleanup(setattr, archive_file, 'storage', archive_file.storage)
+        archive_file.storage = FileSystemStorage(location=tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, archive_file.storage.location)
+
+    def exports(self):
+        day = lambda hours: (self.cutoff + timezone.timedelta(hours=hours)).date().isoformat()
+        queries = [
+            {}, {'action': "Uploaded Evidence"}, {'user': 'none'}, {'user': self.user.pk},
+            {'stage': 1}, {'pole': 3, 'action': "Created Item"},
+            {'start': day(-80), 'end': day(-30)}, {'start': day(-30)}, {'end': day(-100)},
+        ]
+        url = reverse('export_project_logs', args=[self.project.pk])
+        return [b"".join(self.client.get(url, query, secure=True).streaming_content).decode() for query in queries]
+
+    def test_export_is_unchanged_by_archiving(self):
+        before = self.exports()
+        self.assertEqual(before[0].count("\r\n"), 41)
+
+        archives, moved = archive_project_logs(self.project, before=self.cutoff, max_rows=4)
+        self.assertEqual((archives, moved), (7, 25))
+        self.assertEqual(self.project.logs.count(), 15)
+        self.assertEqual(self.exports(), before)
+
+        archive_project_logs(self.project, max_rows=6)
+        self.assertFalse(self.project.logs.exists())
+        self.assertEqual(self.project.log_archives.count(), 10)
+        self.assertEqual(self.exports(), before)
+        self.assertEqual(ProjectLog.objects.count(), 1)
+
+
+@override_settings(STATICFILES_STORAGE='django.contrib.staticfiles.storage.StaticFilesStorage')
+class ProjectDetailPaginationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        cls.project_type = ProjectType.objects.create(name="Street Light")
+        StageDefinition.objects.create(project_type=cls.project_type, name="Pit", order=0)
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def make_project(self, count, flag_every):
+        project = Project.objects.create(name=f"City {count}", project_type=self.project_type)
+        Pole.objects.bulk_create(Pole(project=project, identifier=f"P{i}", custom_id=f"{project.pk}-{i}") for i in range(count))
+        poles = list(project.poles.order_by('id'))
+        ProjectIssue.objects.bulk_create(
+            ProjectIssue(pole=pole, message="Blurry photo", status='OPEN' if i % 2 else 'RESOLVED')
+            for i, pole in enumerate(poles) if i % flag_every == 0
+        )
+        return project
+
+    def get(self, project, after=None):
+        return self.client.get(reverse('project_detail', args=[project.pk]), {'after': after} if after else {}, secure=True)
+
+    def test_pages_list_flagged_poles_first_then_the_rest(self):
+        project = self.make_project(2 * POLES_PER_PAGE + 10, flag_every=3)
+        flagged = set(ProjectIssue.objects.filter(status='OPEN').values_list('pole_id', flat=True))
+        ids = sorted(project.poles.values_list('id', flat=True))
+        expected = [i for i in ids if i in flagged] + [i for i in ids if i not in flagged]
+
+        seen, after = [], None
+        while True:
+            context = self.get(project, after).context
+            seen += [(pole.id, pole.has_open_issue) for pole in context['poles']]
+            after = context['next_cursor']
+            if after is None: break
+        self.assertEqual([pole_id for pole_id, _ in seen], expected)
+        self.assertEqual([pole_id for pole_id, flag in seen if flag], [i for i in expected if i in flagged])
+
+    def test_page_queries_do_not_grow_with_poles(self):
+        small, large = self.make_project(POLES_PER_PAGE + 5, flag_every=10), self.make_project(20 * POLES_PER_PAGE, flag_every=10)
+        def page_queries(project, after=None):
+            with CaptureQueriesContext(connection) as queries:
+                response = self.get(project, after)
+            return [re.sub(r"\d+", "N", query['sql']) for query in queries], response.context['next_cursor']
+        small_first, small_next = page_queries(small)
+        large_first, large_next = page_queries(large)
+        self.assertEqual(small_first, large_first)
+        self.assertEqual(page_queries(small, small_next)[0], page_queries(large, large_next)[0])
@@ -12,6 +12,7 @@ urlpatterns = [
     path('', views.dashboard, name='dashboard'),
     path('project/<int:project_id>/', views.project_detail, name='project_detail'),
     path('project/<int:project_id>/add_item/', views.create_project_item, name='create_project_item'),
+    path('project/<int:project_id>/fields/<int:field_id>/typeahead/', views.dropdown_typeahead, name='dropdown_typeahead'),
     path('project/<int:project_id>/complete/', views.mark_project_completed, name='mark_project_completed'),
     path('pole/<int:pole_id>/', views.pole_detail, name='pole_detail'),
     path('evidence/<int:evidence_id>/delete/', views.delete_evidence, name='delete_evidence'),
@@ -32,6 +33,7 @@ urlpatterns = [
 
     # --- AUDIT LOGS ---
     path('project/<int:project_id>/logs/', views.project_logs, name='project_logs'),
+    path('project/<int:project_id>/logs/feed/', views.project_logs_feed, name='project_logs_feed'),
     path('project/<int:project_id>/logs/export/', views.export_project_logs, name='export_project_logs'),
 
     # tracker/urls.py
@@ -1,7 +1,12 @@
+import bisect
 import textwrap
 import openpyxl
 import csv
 import os
+import time
+import logging
+import threading
+from collections import OrderedDict
 from PIL import Image, ImageDraw, ImageFont, ExifTags, ImageOps
 from io import BytesIO
 from django.core.files.base import ContentFile
@@ -9,9 +14,15 @@ from django.contrib.staticfiles import finders
 from geopy.geocoders import Nominatim
 import datetime
 import functools
+import hashlib
+import io
+from django.conf import settings
 from django.core.cache import cache
+from django.db import IntegrityError, transaction
 from django.http import HttpResponseForbidden
 
+logger = logging.getLogger(__name__)
+
 # ==========================================
 # 5. SECURITY UTILS (NEW)
 # ==========================================
@@ -48,73 +59,253 @@ def rate_limit(limit=10, period=60):
 # ==========================================
 # 1. ADDRESS LOOKUP
 # ==========================================
+# Poles in one village are metres apart, so lookups are keyed on coordinates
+# rounded to GEOCODE_PRECISION decimals. Resolution order: in-process LRU ->
+# GeocodeCache table -> Nominatim. Concurrent lookups for the same key share one
+# network call (single-flight) and network calls are throttled to Nominatim's
+# 1 request/second usage policy.
+_geolocator = None
+_geocode_lock = threading.Lock()
+_geocode_lru = OrderedDict()
+_geocode_inflight = {}
+_nominatim_lock = threading.Lock()
+_nominatim_last_call = 0.0
+
+def _geocode_key(lat, lon):
+    precision = settings.GEOCODE_PRECISION
+    return f"{float(lat):.{precision}f},{float(lon):.{precision}f}"
+
+def _lru_get(key):
+    with _geocode_lock:
+        address = _geocode_lru.get(key)
+        if address is not None:
+            _geocode_lru.move_to_end(key)
+        return address
+
+def _lru_put(key, address):
+    with _geocode_lock:
+        _geocode_lru[key] = address
+        _geocode_lru.move_to_end(key)
+        while len(_geocode_lru) > settings.GEOCODE_LRU_SIZE:
+            _geocode_lru.popitem(last=False)
+
+def _reverse_geocode(key):
+    global _geolocator, _nominatim_last_call
+    from .models import GeocodeCache
+
+    address = GeocodeCache.objects.filter(key=key).values_list('address', flat=True).first()
+    if address:
+        return address
+
+    lat, lon = (float(part) for part in key.split(','))
+    with _nominatim_lock:
+        wait = settings.GEOCODE_MIN_INTERVAL - (time.monotonic() - _nominatim_last_call)
+        if wait > 0:
+            time.sleep(wait)
+        try:
+            if _geolocator is None:
+                # User-agent required by Nominatim
+                _geolocator = Nominatim(user_agent="tracker_app_v2")
+            location = _geolocator.reverse((lat, lon), exactly_one=True, timeout=5)
+        finally:
+            _nominatim_last_call = time.monotonic()
+
+    if not location:
+        return None
+    GeocodeCache.objects.get_or_create(key=key, defaults={'address': location.address})
+    return location.address
+
 def get_address_from_coords(lat, lon):
     if not lat or not lon:
         return "Address Unavailable"
+    key = _geocode_key(lat, lon)
+    address = _lru_get(key)
+    if address is not None:
+        return address
+
+    with _geocode_lock:
+        pending = _geocode_inflight.get(key)
+        if pending is None:
+            pending = _geocode_inflight[key] = threading.Event()
+            is_leader = True
+        else:
+            is_leader = False
+
+    if not is_leader:
+        # Another thread is already resolving this key; share its result
+        pending.wait(timeout=15)
+        return _lru_get(key) or "Location Unknown"
+
     try:
-        # User-agent required by Nominatim
-        geolocator = Nominatim(user_agent="tracker_app_v2")
-        location = geolocator.reverse((float(lat), float(lon)), exactly_one=True, timeout=5)
-        if location:
-            return location.address
+        address = _reverse_geocode(key)
+        if address:
+            _lru_put(key, address)
+            return address
     except Exception as e:
-        print(f"DEBUG: Geocoding Failed: {e}")
+        logger.warning(f"Geocoding Failed: {e}")
+    finally:
+        with _geocode_lock:
+            _geocode_inflight.pop(key, None)
+        pending.set()
     return "Location Unknown"
 
 # ==========================================
-# 2. GPS EXTRACTION
+# 2. IMAGE INGEST & GPS EXTRACTION
 # ==========================================
+EXIF_ORIENTATION = 0x0112
+EXIF_GPS_IFD = 0x8825
+# Orientations that rotate by 90/270 degrees, swapping width and height
+TRANSPOSED_ORIENTATIONS = (5, 6, 7, 8)
+
 def _convert_to_degrees(value):
     d = float(value[0])
     m = float(value[1])
     s = float(value[2])
     return d + (m / 60.0) + (s / 3600.0)
 
-def get_gps_from_image(image_field):
-    try:
-        img = Image.open(image_field)
-        exif_data = img._getexif()
-        if not exif_data: return None, None
-        
-        gps_info = exif_data.get(34853)
-        if not gps_info: return None, None
-
-        lat_gps = gps_info.get(2)
-        lat_ref = gps_info.get(1)
-        lon_gps = gps_info.get(4)
-        lon_ref = gps_info.get(3)
-
-        if lat_gps and lat_ref and lon_gps and lon_ref:
-            lat = _convert_to_degrees(lat_gps)
-            if lat_ref != 'N': lat = -lat
-            lon = _convert_to_degrees(lon_gps)
-            if lon_ref != 'E': lon = -lon
-            return f"{lat:.6f}", f"{lon:.6f}"
-    except Exception:
-        pass
+def _gps_from_exif(exif):
+    gps_info = exif.get_ifd(EXIF_GPS_IFD)
+    if not gps_info: return None, None
+
+    lat_gps = gps_info.get(2)
+    lat_ref = gps_info.get(1)
+    lon_gps = gps_info.get(4)
+    lon_ref = gps_info.get(3)
+
+    if lat_gps and lat_ref and lon_gps and lon_ref:
+        lat = _convert_to_degrees(lat_gps)
+        if lat_ref != 'N': lat = -lat
+        lon = _convert_to_degrees(lon_gps)
+        if lon_ref != 'E': lon = -lon
+        return f"{lat:.6f}", f"{lon:.6f}"
     return None, None
 
+class ImageIngest:
+    """
+    One open of an uploaded photo. GPS, orientation and the upright size are read
+    from the header on construction; pixels are decoded only by `decode()`, and
+    the decoded image is shared by the watermark and derivative steps.
+    """
+    def __init__(self, file):
+        self.file = file
+        file.seek(0)
+        self._source = Image.open(file)
+        self.format = self._source.format
+        exif = self._source.getexif()
+        self.orientation = exif.get(EXIF_ORIENTATION, 1)
+        try:
+            self.gps = _gps_from_exif(exif)
+        except Exception:
+            self.gps = (None, None)
+        width, height = self._source.size
+        self.size = (height, width) if self.orientation in TRANSPOSED_ORIENTATIONS else (width, height)
+        self.image = None
+
+    def decode(self, max_dimension=None):
+        """Upright RGB pixels, no larger than `max_dimension` when given."""
+        if self.image is not None:
+            return self.image
+
+        img = self._source
+        width, height = img.size
+        if max_dimension and max(width, height) > max_dimension:
+            # JPEG only: the decoder scales by 1/2, 1/4 or 1/8 while still covering the target
+            scale = max_dimension / max(width, height)
+            img.draft('RGB', (int(width * scale) + 1, int(height * scale) + 1))
+        ImageOps.exif_transpose(img, in_place=True) # Critical for phone photos!
+        if img.mode != "RGB":
+            img = img.convert("RGB")
+        if max_dimension and max(img.size) > max_dimension:
+            img.thumbnail((max_dimension, max_dimension), Image.Resampling.LANCZOS)
+        self.image = img
+        return img
+
 # ==========================================
 # 3. DYNAMIC WATERMARKING LOGIC
 # ==========================================
-def watermark_image(image_field, lat, lon):
+# Try multiple common font paths for Linux/Windows servers
+WATERMARK_FONT_PATHS = [
+    "arial.ttf", 
+    "DejaVuSans-Bold.ttf", 
+    "DejaVuSans.ttf",
+    "/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf",
+    "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf"
+]
+# Font and logo sizes scale with the photo; rounding them to buckets lets photos
+# from the same few phone models share cached assets.
+WATERMARK_SIZE_BUCKET = 4
+
+def _size_bucket(size):
+    return max(WATERMARK_SIZE_BUCKET, int(round(size / WATERMARK_SIZE_BUCKET)) * WATERMARK_SIZE_BUCKET)
+
+@functools.lru_cache(maxsize=None)
+def resolve_watermark_font_path():
+    """First usable TTF from WATERMARK_FONT_PATHS, probed once per process."""
+    for path in WATERMARK_FONT_PATHS:
+        try:
+            ImageFont.truetype(path, 12)
+            return path
+        except OSError: continue
+    logger.warning("No TrueType font found for watermarks; using the default bitmap font.")
+    return None
+
+@functools.lru_cache(maxsize=64)
+def _load_watermark_font(size):
+    path = resolve_watermark_font_path()
+    # Fallback if no TTF found (Default font is tiny, but better than crash)
+    return ImageFont.truetype(path, size) if path else ImageFont.load_default()
+
+def get_watermark_font(size):
+    return _load_watermark_font(_size_bucket(size))
+
+@functools.lru_cache(maxsize=1)
+def _load_logo_source():
+    logo_path = finders.find('tracker/logo.png')
+    if not logo_path:
+        return None
+    with Image.open(logo_path) as logo:
+        return logo.convert("RGBA")
+
+@functools.lru_cache(maxsize=32)
+def _load_watermark_logo(height):
+    source = _load_logo_source()
+    if source is None:
+        return None
+    # Resize logo maintaining aspect ratio
+    logo = source.copy()
+    logo.thumbnail((int(height * source.width / source.height), height), Image.Resampling.LANCZOS)
+    return logo
+
+def get_watermark_logo(height):
+    """Shared, read-only RGBA logo scaled to roughly `height` pixels (None if missing)."""
     try:
-        print("DEBUG: Processing Image for Watermark...")
+        return _load_watermark_logo(_size_bucket(height))
+    except Exception:
+        return None
+
+def watermark_image(image_field, lat, lon, address=None):
+    """
+    Stamps the branding box on `image_field` (a file or an ImageIngest) and
+    returns a JPEG ContentFile; on failure the original file is returned.
+    """
+    ingest = image_field if isinstance(image_field, ImageIngest) else None
+    try:
+        logger.debug("Processing image for watermark")
         
         COMPANY_NAME = "Nexsafe"
         
         # 1. Prepare Data
         if lat and lon:
-            address_text = get_address_from_coords(lat, lon)
+            address_text = address or get_address_from_coords(lat, lon)
             gps_text = f"Lat: {float(lat):.6f}, Lon: {float(lon):.6f}"
         else:
             address_text = "Location Not Captured"
             gps_text = "GPS Unavailable"
 
-        # 2. Load & Orient Image
-        img = Image.open(image_field)
-        img = ImageOps.exif_transpose(img) # Critical for phone photos!
-        img = img.convert("RGBA")
+        # 2. Load & Orient Image (single decode; WATERMARK_MAX_DIMENSION=0 keeps full size)
+        ingest = ingest or ImageIngest(image_field)
+        img = ingest.decode(settings.WATERMARK_MAX_DIMENSION)
+
         draw = ImageDraw.Draw(img)
         W, H = img.size
         
@@ -134,46 +325,17 @@ def watermark_image(image_field, lat, lon):
         font_body_size = int(base_dim * BODY_RATIO)
         padding = int(base_dim * PADDING_RATIO)
 
-        # 3. Load Fonts
-        # Try multiple common font paths for Linux/Windows servers
-        font_paths = [
-            "arial.ttf", 
-            "DejaVuSans-Bold.ttf", 
-            "DejaVuSans.ttf",
-            "/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf",
-            "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf"
-        ]
-        
-        font_title = None
-        font_body = None
-
-        for path in font_paths:
-            try:
-                if not font_title: font_title = ImageFont.truetype(path, font_title_size)
-                if not font_body: font_body = ImageFont.truetype(path, font_body_size)
-            except OSError: continue
-            
-        # Fallback if no TTF found (Default font is tiny, but better than crash)
-        if not font_title: font_title = ImageFont.load_default()
-        if not font_body: font_body = ImageFont.load_default()
+        # 3. Load Fonts (resolved once per process, memoized per size bucket)
+        font_title = get_watermark_font(font_title_size)
+        font_body = get_watermark_font(font_body_size)
 
         # 4. Wrap Address (approx characters based on width)
         # We calculate wrap width dynamically based on font size
         chars_per_line = 40 
         wrapped_address = "\n".join(textwrap.wrap(address_text, width=chars_per_line))
 
-        # 5. Load Logo
-        logo_path = finders.find('tracker/logo.png')
-        logo = None
-        if logo_path:
-            try:
-                logo = Image.open(logo_path).convert("RGBA")
-                # Resize logo maintaining aspect ratio
-                aspect = logo.width / logo.height
-                new_h = logo_target_size
-                new_w = int(new_h * aspect)
-                logo.thumbnail((new_w, new_h), Image.Resampling.LANCZOS)
-            except Exception: pass
+        # 5. Load Logo (decoded once, resized once per size bucket)
+        logo = get_watermark_logo(logo_target_size)
 
         # 6. Measure Text Block
         def get_text_size(text, font):
@@ -202,30 +364,34 @@ def watermark_image(image_field, lat, lon):
         # 8. Placement (Bottom Right)
         x2 = W - padding
         y2 = H - padding
-        x1 = x2 - box_width
-        y1 = y2 - box_height
+        x1 = int(x2 - box_width)
+        y1 = int(y2 - box_height)
 
         # 9. Draw Background Box
-        overlay = Image.new("RGBA", img.size, (0, 0, 0, 0))
+        # Only the box region is composited: a full-frame RGBA copy plus overlay
+        # costs ~3x the photo in RAM, while the box is a few percent of it.
+        region = img.crop((x1, y1, x2, y2)).convert("RGBA")
+        overlay = Image.new("RGBA", region.size, (0, 0, 0, 0))
         overlay_draw = ImageDraw.Draw(overlay)
+        box = [0, 0, region.width - 1, region.height - 1]
         
         # Rounded corners if supported, else rectangle
         if hasattr(overlay_draw, "rounded_rectangle"):
-            overlay_draw.rounded_rectangle([x1, y1, x2, y2], radius=int(padding/2), fill=(0, 0, 0, 180))
+            overlay_draw.rounded_rectangle(box, radius=int(padding/2), fill=(0, 0, 0, 180))
         else:
-            overlay_draw.rectangle([x1, y1, x2, y2], fill=(0, 0, 0, 180))
+            overlay_draw.rectangle(box, fill=(0, 0, 0, 180))
         
-        img = Image.alpha_composite(img, overlay)
-        draw = ImageDraw.Draw(img)
+        region = Image.alpha_composite(region, overlay)
+        draw = ImageDraw.Draw(region)
 
-        # 10. Draw Content
-        current_x = x1 + padding
-        current_y = y1 + padding
+        # 10. Draw Content (coordinates are relative to the box)
+        current_x = padding
+        current_y = padding
 
         # Draw Logo (Centered Vertically in Box)
         if logo:
-            logo_y = y1 + (box_height - logo_h) // 2
-            img.paste(logo, (int(current_x), int(logo_y)), logo)
+            logo_y = (region.height - logo_h) // 2
+            region.paste(logo, (int(current_x), int(logo_y)), logo)
             current_x += logo_w + padding
 
         # Draw Text
@@ -240,59 +406,263 @@ def watermark_image(image_field, lat, lon):
         # Address
         draw.text((current_x, current_y), wrapped_address, fill="#b0b0b0", font=font_body)
 
+        img.paste(region.convert("RGB"), (x1, y1))
+
         # 11. Output
         buffer = BytesIO()
-        img.convert("RGB").save(buffer, format='JPEG', quality=95)
+        save_options = {'quality': settings.WATERMARK_JPEG_QUALITY, 'progressive': settings.WATERMARK_JPEG_PROGRESSIVE}
+        if settings.WATERMARK_JPEG_SUBSAMPLING is not None:
+            save_options['subsampling'] = settings.WATERMARK_JPEG_SUBSAMPLING
+        img.save(buffer, format='JPEG', **save_options)
         return ContentFile(buffer.getvalue())
 
     except Exception as e:
-        print(f"DEBUG: Watermark Logic Crashed: {e}")
-        image_field.seek(0)
-        return image_field
+        logger.error(f"Watermarking failed, keeping the original image: {e}", exc_info=True)
+        original = image_field.file if isinstance(image_field, ImageIngest) else image_field
+        original.seek(0)
+        return original
+
+def make_image_derivatives(source):
+    """
+    Returns {name: ContentFile} with one downscaled JPEG per
+    EVIDENCE_DERIVATIVE_SIZES entry. `source` is a decoded PIL image (e.g. the
+    ImageIngest image after watermarking) or a file, which is opened in JPEG
+    draft mode so it decodes straight at a reduced scale.
+    """
+    sizes = sorted(settings.EVIDENCE_DERIVATIVE_SIZES.items(), key=lambda item: -item[1])
+    if isinstance(source, Image.Image):
+        img = source
+    else:
+        source.seek(0)
+        with Image.open(source) as opened:
+            opened.draft('RGB', (sizes[0][1], sizes[0][1]))
+            img = opened.convert('RGB')
+        source.seek(0)
+
+    derivatives = {}
+    for name, max_side in sizes:
+        # Largest first, each resized from the previous; the source image is never modified
+        ratio = min(1, max_side / max(img.size))
+        img = img.resize((max(1, round(img.width * ratio)), max(1, round(img.height * ratio))), Image.Resampling.LANCZOS, reducing_gap=3.0)
+        buffer = BytesIO()
+        img.save(buffer, format='JPEG', quality=80, optimize=True, progressive=True)
+        derivatives[name] = ContentFile(buffer.getvalue())
+    return derivatives
 
 # ==========================================
 # 4. EXCEL HELPERS
 # ==========================================
-def get_file_headers(file_field):
-    if not file_field: return []
+# A project's data file is parsed once per uploaded version into DataFileIndex /
+# DataFileColumn rows. Forms read headers and dropdown values through the cache
+# -> database, and only a missing index triggers the download and parse.
+def _open_data_file(file_field):
+    try: file_field.open('rb')
+    except: pass
+    file_field.seek(0)
+
+def _iter_data_file_rows(file_field):
+    """
+    Streams the rows of a CSV/XLSX data file, header first, without loading the
+    whole sheet: XLSX rows are value tuples from a read-only workbook, CSV rows
+    are decoded incrementally.
+    """
+    _open_data_file(file_field)
+    if file_field.name.lower().endswith('.xlsx'):
+        workbook = openpyxl.load_workbook(file_field, read_only=True, data_only=True)
+        try:
+            yield from workbook.active.iter_rows(values_only=True)
+        finally:
+            workbook.close()
+    else:
+        stream = io.TextIOWrapper(file_field, encoding='utf-8-sig', newline='')
+        try:
+            yield from csv.reader(stream)
+        finally:
+            # Leave the underlying file open for the caller
+            stream.detach()
+
+def _cell_text(value):
+    return '' if value is None else str(value).strip()
+
+def parse_data_file(file_field, columns=None):
+    """
+    One streaming pass over the file: (headers, {header: sorted distinct values},
+    data row count). Only the `columns` listed (default: all) are materialized.
+    """
+    rows = _iter_data_file_rows(file_field)
+    headers = [_cell_text(value) for value in next(rows, ())]
+    wanted = [(i, name) for i, name in enumerate(headers) if name and (columns is None or name in columns)]
+    values = {name: set() for _, name in wanted}
+    row_count = 0
+    for row in rows:
+        row_count += 1
+        for i, name in wanted:
+            if i < len(row):
+                text = _cell_text(row[i])
+                if text: values[name].add(text)
+    return [name for name in headers if name], {name: sorted(found) for name, found in values.items()}, row_count
+
+def iter_data_file_columns(file_field, columns):
+    """Streams the data rows as tuples of the stripped text of `columns` ('' where absent)."""
+    rows = _iter_data_file_rows(file_field)
+    headers = [_cell_text(value) for value in next(rows, ())]
+    positions = [headers.index(column) if column in headers else None for column in columns]
+    for row in rows:
+        yield tuple(_cell_text(row[i]) if i is not None and i < len(row) else '' for i in positions)
+
+def _dropdown_columns(project):
+    """Data file columns referenced by the project's DROPDOWN fields."""
+    return {
+        column.strip() for column in
+        project.field_definitions.filter(field_type='DROPDOWN').values_list('excel_column', flat=True)
+        if column.strip()
+    }
+
+def _data_file_hash(file_field):
+    _open_data_file(file_field)
+    digest = hashlib.sha256()
+    for chunk in file_field.chunks():
+        digest.update(chunk)
+    return digest.hexdigest()
+
+def build_data_file_index(project):
+    """
+    Parses project.data_file into a fresh DataFileIndex, replacing older versions.
+    Values are stored for the columns used by DROPDOWN fields; other columns are
+    added on demand by index_data_file_columns. A file whose contents were
+    already indexed (same hash) is copied, not re-parsed. Returns None if the
+    file cannot be read.
+    """
+    from .models import DataFileIndex, DataFileColumn
+    if not project.data_file: return None
     try:
-        try: file_field.open('rb')
-        except: pass
-        file_field.seek(0)
-        filename = file_field.name.lower()
-        if filename.endswith('.xlsx'):
-            workbook = openpyxl.load_workbook(file_field, data_only=True)
-            sheet = workbook.active
-            return [str(cell.value).strip() for cell in sheet[1] if cell.value]
+        content_hash = _data_file_hash(project.data_file)
+        existing = DataFileIndex.objects.filter(content_hash=content_hash).exclude(project=project).first()
+        if existing:
+            headers, row_count = existing.headers, existing.row_count
+            values = dict(existing.columns.values_list('name', 'values'))
         else:
-            decoded = file_field.read().decode('utf-8-sig').splitlines()
-            reader = csv.reader(decoded)
-            return next(reader, [])
-    except: return []
-
-def get_dropdown_options(file_field, column_name):
-    if not file_field: return []
-    options = set()
+            headers, values, row_count = parse_data_file(project.data_file, columns=_dropdown_columns(project))
+    except Exception as e:
+        logger.warning(f"Data file for project {project.pk} could not be parsed: {e}")
+        return None
+
     try:
-        try: file_field.open('rb')
-        except: pass
-        file_field.seek(0)
-        filename = file_field.name.lower()
-        if filename.endswith('.xlsx'):
-            workbook = openpyxl.load_workbook(file_field, data_only=True)
-            sheet = workbook.active
-            headers = [str(cell.value).strip() if cell.value else '' for cell in sheet[1]]
-            try:
-                idx = headers.index(column_name.strip())
-                for row in sheet.iter_rows(min_row=2, values_only=True):
-                    if row[idx]: options.add(str(row[idx]).strip())
-            except ValueError: pass
-        else:
-            decoded = file_field.read().decode('utf-8-sig').splitlines()
-            reader = csv.DictReader(decoded)
-            reader.fieldnames = [name.strip() for name in reader.fieldnames]
-            if column_name.strip() in reader.fieldnames:
-                for row in reader:
-                    if row.get(column_name.strip()): options.add(row.get(column_name.strip()).strip())
-        return [(o, o) for o in sorted(list(options))]
-    except: return []
\ No newline at end of file
+        with transaction.atomic():
+            DataFileIndex.objects.filter(project=project).delete()
+            index = DataFileIndex.objects.create(
+                project=project, file_name=project.data_file.name, content_hash=content_hash,
+                headers=headers, row_count=row_count
+            )
+            DataFileColumn.objects.bulk_create([
+                DataFileColumn(index=index, name=name, values=column_values, value_count=len(column_values))
+                for name, column_values in values.items()
+            ])
+    except IntegrityError:
+        # A concurrent request indexed the same file version first
+        return DataFileIndex.objects.filter(project=project, file_name=project.data_file.name).first()
+    return index
+
+def index_data_file_columns(project, index, columns=None):
+    """
+    Adds values for `columns` (header names; default: the DROPDOWN columns)
+    missing from `index`, in one pass over the file.
+    """
+    from .models import DataFileColumn
+    if columns is None: columns = _dropdown_columns(project)
+    missing = set(columns) & set(index.headers)
+    missing -= set(index.columns.filter(name__in=missing).values_list('name', flat=True))
+    if not missing: return
+    try:
+        _, values, _ = parse_data_file(project.data_file, columns=missing)
+    except Exception as e:
+        logger.warning(f"Data file for project {project.pk} could not be parsed: {e}")
+        return
+    DataFileColumn.objects.bulk_create([
+        DataFileColumn(index=index, name=name, values=column_values, value_count=len(column_values))
+        for name, column_values in values.items()
+    ], ignore_conflicts=True)
+
+def get_data_file_index(project):
+    """DataFileIndex for the project's current data file, building it on first use."""
+    from .models import DataFileIndex
+    if not project.data_file: return None
+    index = DataFileIndex.objects.filter(project=project, file_name=project.data_file.name).first()
+    return index or build_data_file_index(project)
+
+def _data_file_cache_key(project, kind, column=''):
+    digest = hashlib.md5(f"{project.data_file.name}|{column}".encode()).hexdigest()
+    return f"datafile:{project.pk}:{kind}:{digest}"
+
+def get_file_headers(project):
+    if not project.data_file: return []
+    key = _data_file_cache_key(project, 'headers')
+    headers = cache.get(key)
+    if headers is None:
+        index = get_data_file_index(project)
+        if index is None: return []
+        headers = index.headers
+        cache.set(key, headers, settings.DATA_FILE_CACHE_TIMEOUT)
+    return headers
+
+def get_dropdown_values(project, column_name):
+    """Sorted distinct values of a data file column."""
+    if not project.data_file or not column_name: return []
+    column_name = column_name.strip()
+    key = _data_file_cache_key(project, 'column', column_name)
+    values = cache.get(key)
+    if values is None:
+        index = get_data_file_index(project)
+        if index is None: return []
+        if not index.columns.filter(name=column_name).exists():
+            index_data_file_columns(project, index, [column_name])
+        values = index.columns.filter(name=column_name).values_list('values', flat=True).first() or []
+        cache.set(key, values, settings.DATA_FILE_CACHE_TIMEOUT)
+    return values
+
+# Per-process typeahead indexes: (case-folded, value) pairs sorted for bisect,
+# keyed like the cache entries so a new data file upload gets a new index
+TYPEAHEAD_INDEX_LIMIT = 32
+_typeahead_indexes = OrderedDict()
+_typeahead_lock = threading.Lock()
+
+def _typeahead_index(project, column_name):
+    key = _data_file_cache_key(project, 'column', column_name.strip())
+    with _typeahead_lock:
+        index = _typeahead_indexes.get(key)
+        if index is not None:
+            _typeahead_indexes.move_to_end(key)
+            return index
+    index = sorted((value.casefold(), value) for value in get_dropdown_values(project, column_name))
+    with _typeahead_lock:
+        _typeahead_indexes[key] = index
+        while len(_typeahead_indexes) > TYPEAHEAD_INDEX_LIMIT:
+            _typeahead_indexes.popitem(last=False)
+    return index
+
+def search_dropdown_values(project, column_name, query, limit=20):
+    """
+    Up to `limit` values of a data file column matching `query`, case-insensitively:
+    prefix matches first (binary search), then substring matches. Returns
+    (matches, truncated).
+    """
+    index = _typeahead_index(project, column_name)
+    query = query.strip().casefold()
+
+    matches = []
+    start = bisect.bisect_left(index, (query,))
+    for folded, value in index[start:]:
+        if not folded.startswith(query) or len(matches) > limit: break
+        matches.append(value)
+    if query and len(matches) <= limit:
+        for folded, value in index:
+            if query in folded and not folded.startswith(query):
+                matches.append(value)
+                if len(matches) > limit: break
+    return matches[:limit], len(matches) > limit
+
+def is_dropdown_value(project, column_name, value):
+    """Membership test against the column's sorted values."""
+    values = get_dropdown_values(project, column_name)
+    i = bisect.bisect_left(values, value)
+    return i < len(values) and values[i] == value
@@ -1,23 +1,43 @@
+import io
 import sys
 import csv
+import json
+import hashlib
 import logging
-from django.core.files.uploadedfile import InMemoryUploadedFile
+from urllib.parse import urlencode
+from datetime import datetime, timedelta, timezone as dt_timezone
+from itertools import chain
+from django.conf import settings
+from django.core.cache import cache
 from django.shortcuts import render, get_object_or_404, redirect
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
 from django.contrib.auth.decorators import login_required
 from django.contrib.admin.views.decorators import staff_member_required
 from django.views.decorators.cache import never_cache
 from django.contrib import messages
-from django.http import HttpResponse
+from django.http import JsonResponse, StreamingHttpResponse
 from django.core.exceptions import PermissionDenied
-from django.db.models import Q
-from django.utils import timezone
-from .models import Project, Pole, StageDefinition, Evidence, ItemFieldValue, Client, ProjectIssue, ProjectLog
+from django.db import transaction
+from django.db.models import Exists, Max, OuterRef, Prefetch, Q
+from django.utils import dateformat, timezone
+from django.utils.dateparse import parse_date
+from .models import Project, Pole, PoleSearchDocument, PoleSequence, Evidence, ItemFieldDefinition, ItemFieldValue, Client, ProjectIssue, ProjectLog, User
 from .forms import EvidenceForm, DynamicItemForm, IssueForm
-from .utils import watermark_image, get_gps_from_image, rate_limit
+from .utils import rate_limit, search_dropdown_values
+from .jobs import enqueue_evidence
+from .archive import iter_archived_logs
+from . import audit
 
 # Configure standard logger
 logger = logging.getLogger(__name__)
 
+POLES_PER_PAGE = 50
+SEARCH_RESULTS_PER_PAGE = 25
+LOGS_PER_PAGE = 100
+LOG_CURSOR_EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+LOG_EXPORT_CHUNK_SIZE = 2000
+
 # ==========================================
 # 0. SECURITY & LOGGING HELPERS
 # ==========================================
@@ -38,23 +58,43 @@ def check_project_access(user, project):
     logger.warning(f"SECURITY ALERT: User {user.username} (ID: {user.id}) tried to access Project {project.id} without permission.")
     raise PermissionDenied("You are not authorized to access this project.")
 
-def log_action(project, user, action, target, details="", lat=None, lon=None):
-    """Helper to record an audit log entry."""
+def log_action(project, user, action, target, details="", lat=None, lon=None, data=None):
+    """
+    Helper to record an audit log entry. `data` is the structured payload
+    (pole_id, stage_id, issue_id, fields) that the log filters query. The entry
+    is handed to the buffered audit writer (tracker/audit.py) once the
+    surrounding transaction commits, so a rolled-back request leaves no log
+    behind in either AUDIT_BUFFERED mode.
+    """
     try:
         user_obj = user if (user and user.is_authenticated) else None
-        ProjectLog.objects.create(
-            project=project,
-            user=user_obj,
+        entry = ProjectLog(
+            project_id=project.pk,
+            user_id=user_obj.pk if user_obj else None,
             action=action,
             target=target,
             details=details,
+            payload=data or {},
             gps_lat=lat,
             gps_long=lon
         )
+        transaction.on_commit(lambda: audit.record(entry))
     except Exception as e:
         # Use proper logging instead of print
         logger.error(f"AUDIT LOG FAILURE: Could not save log entry. Error: {e}", exc_info=True)
 
+def render_cached_fragment(cache_key, template_name, build_context):
+    """
+    Renders a page fragment once per cache key. Callers put a content version
+    in the key, so a write never serves stale HTML; it just misses the cache.
+    Fragments must not contain per-request data (CSRF tokens, messages, user).
+    """
+    html = cache.get(cache_key)
+    if html is None:
+        html = render_to_string(template_name, build_context())
+        cache.set(cache_key, html, settings.CLIENT_PAGE_CACHE_TIMEOUT)
+    return mark_safe(html)
+
 # ==========================================
 # 1. MAIN DASHBOARD
 # ==========================================
@@ -63,16 +103,10 @@ def log_action(project, user, action, target, details="", lat=None, lon=None):
 def dashboard(request):
     is_admin = request.user.is_superuser or request.user.is_staff
     
-    # Self-Healing: Fix Missing IDs
-    poles_missing_ids = Pole.objects.filter(custom_id__isnull=True)
-    if poles_missing_ids.exists():
-        for p in poles_missing_ids:
-            p.save()
-    
     if is_admin:
-        projects_query = Project.objects.all().order_by('-created_at')
+        projects_query = Project.objects.with_stats().order_by('-created_at')
     else:
-        projects_query = Project.objects.filter(contractors=request.user).order_by('-created_at')
+        projects_query = Project.objects.with_stats().filter(contractors=request.user).order_by('-created_at')
     
     active_projects = projects_query.filter(status='ACTIVE')
     completed_projects = projects_query.filter(status='COMPLETED')
@@ -84,65 +118,219 @@ def dashboard(request):
         # Limit length to prevent DoS via massive regex
         search_query = search_query[:100].strip()
     search_results = None
+    search_page, search_has_next = 1, False
     
     if search_query:
-        search_results = Pole.objects.filter(
-            Q(identifier__icontains=search_query) | 
-            Q(custom_id__icontains=search_query) 
+        # Ranked lookup in the pole search index; one extra id tells us if there is a next page
+        try:
+            search_page = max(1, int(request.GET.get('page', 1)))
+        except ValueError:
+            search_page = 1
+        project_ids = None if is_admin else request.user.assigned_projects.values_list('id', flat=True)
+        pole_ids = PoleSearchDocument.objects.search(
+            search_query, project_ids=project_ids, limit=SEARCH_RESULTS_PER_PAGE + 1, offset=(search_page - 1) * SEARCH_RESULTS_PER_PAGE
         )
-        if not is_admin:
-            search_results = search_results.filter(project__contractors=request.user)
+        search_has_next = len(pole_ids) > SEARCH_RESULTS_PER_PAGE
+        pole_ids = pole_ids[:SEARCH_RESULTS_PER_PAGE]
+        poles = Pole.objects.select_related('project').in_bulk(pole_ids)
+        search_results = [poles[pole_id] for pole_id in pole_ids if pole_id in poles]
 
     return render(request, 'tracker/dashboard.html', {
         'active_projects': active_projects,
         'completed_projects': completed_projects,
         'is_admin': is_admin,
         'search_query': search_query,
-        'search_results': search_results
+        'search_results': search_results,
+        'search_page': search_page,
+        'search_has_next': search_has_next,
     })
 
 # ==========================================
 # 2. PROJECT MANAGEMENT & LOGS
 # ==========================================
+def _project_pole_streams(project):
+    """
+    The project's poles as two id-ordered keyset streams: those with an open
+    issue, found through the (status, pole) issue index, and the rest, read in
+    id order off the pole project index. A page takes `id > cursor LIMIT n`
+    from one of them, so it reads about the rows it shows (plus, on the
+    unflagged side, the flagged poles it skips) whatever the project's size.
+    """
+    open_issue_poles = ProjectIssue.objects.filter(status='OPEN', pole__project=project).values('pole_id')
+    poles = project.poles.with_progress().order_by('id')
+    return poles.filter(id__in=open_issue_poles), poles.filter(open_issue_flag=False)
+
 @login_required
 def project_detail(request, project_id):
     project = get_object_or_404(Project, id=project_id)
     check_project_access(request.user, project)  # <--- SECURITY CHECK
     
-    poles = sorted(project.poles.all(), key=lambda p: (not p.has_open_issue, p.id))
-    return render(request, 'tracker/project_detail.html', {'project': project, 'poles': poles})
+    # Flagged poles first, then the rest, each in id order. ?after=<flag>-<id> is
+    # the last pole of the previous page; see _project_pole_streams.
+    flagged, unflagged = _project_pole_streams(project)
+    after = request.GET.get('after', '')
+    try:
+        after_flag, after_id = (int(part) for part in after.split('-', 1))
+    except ValueError:
+        after_flag, after_id = None, None
+
+    if after_id is None or after_flag:
+        poles = list(flagged.filter(id__gt=after_id or 0)[:POLES_PER_PAGE + 1])
+        # The unflagged stream starts on the page where the flagged one runs out
+        if len(poles) <= POLES_PER_PAGE:
+            poles += unflagged[:POLES_PER_PAGE + 1 - len(poles)]
+    else:
+        poles = list(unflagged.filter(id__gt=after_id)[:POLES_PER_PAGE + 1])
+
+    next_cursor = None
+    if len(poles) > POLES_PER_PAGE:
+        poles = poles[:POLES_PER_PAGE]
+        last = poles[-1]
+        next_cursor = f"{int(last.open_issue_flag)}-{last.id}"
+
+    return render(request, 'tracker/project_detail.html', {
+        'project': project,
+        'poles': poles,
+        'next_cursor': next_cursor,
+        'is_first_page': after_id is None,
+    })
+
+def _parse_log_date(value):
+    try:
+        return parse_date(value)
+    except ValueError:
+        return None
+
+def _log_filters(request):
+    """
+    Reads the optional ?start= / ?end= (YYYY-MM-DD, both inclusive), ?action=,
+    ?user= (a user id, or 'none' for client/system entries), ?stage= and ?pole=
+    filters. Returns the ProjectLogQuerySet.matching keyword arguments and the
+    cleaned values for the template.
+    """
+    filters = {key: request.GET.get(key, '').strip() for key in ('start', 'end', 'action', 'user', 'stage', 'pole')}
+    start, end = _parse_log_date(filters['start']), _parse_log_date(filters['end'])
+    for key, value in (('start', start), ('end', end)):
+        if value is None: filters[key] = ''
+    for key in ('user', 'stage', 'pole'):
+        if not filters[key].isdigit() and not (key == 'user' and filters[key] == 'none'):
+            filters[key] = ''
+    matching = {
+        'start': start, 'end': end, 'action': filters['action'],
+        'user_id': int(filters['user']) if filters['user'].isdigit() else None,
+        'system_only': filters['user'] == 'none',
+        'stage_id': int(filters['stage']) if filters['stage'] else None,
+        'pole_id': int(filters['pole']) if filters['pole'] else None,
+    }
+    return matching, filters
+
+def _project_log_page(request, project):
+    """
+    One page of the project's log, newest first, with the user joined in.
+    Keyset pagination on (timestamp, id): ?before=<microseconds>-<id> is the
+    last row of the previous page, so each page is a single index range read
+    however long the log is. Returns (logs, next_cursor, filters).
+    """
+    matching, filters = _log_filters(request)
+    logs = project.logs.select_related('user').matching(**matching)
+
+    before = request.GET.get('before', '')
+    try:
+        before_micros, before_id = (int(part) for part in before.split('-', 1))
+        before_ts = LOG_CURSOR_EPOCH + timedelta(microseconds=before_micros)
+    except (ValueError, OverflowError):
+        before_ts = None
+    if before_ts is not None:
+        # timestamp <= t bounds the index range; the OR only resolves ties on t
+        logs = logs.filter(Q(timestamp__lt=before_ts) | Q(id__lt=before_id), timestamp__lte=before_ts)
+
+    logs = list(logs[:LOGS_PER_PAGE + 1])
+    next_cursor = None
+    if len(logs) > LOGS_PER_PAGE:
+        logs = logs[:LOGS_PER_PAGE]
+        last = logs[-1]
+        next_cursor = f"{(last.timestamp - LOG_CURSOR_EPOCH) // timedelta(microseconds=1)}-{last.id}"
+    return logs, next_cursor, filters
 
 @login_required
 def project_logs(request, project_id):
     project = get_object_or_404(Project, id=project_id)
     check_project_access(request.user, project)  # <--- SECURITY CHECK
-    
-    logs = project.logs.all()
-    return render(request, 'tracker/project_logs.html', {'project': project, 'logs': logs})
+
+    logs, next_cursor, filters = _project_log_page(request, project)
+    users = User.objects.filter(Q(assigned_projects=project) | Q(is_staff=True)).distinct().order_by('username')
+    return render(request, 'tracker/project_logs.html', {
+        'project': project,
+        'logs': logs,
+        'next_cursor': next_cursor,
+        'is_first_page': not request.GET.get('before'),
+        'filters': filters,
+        'filter_query': urlencode({key: value for key, value in filters.items() if value}),
+        'users': users,
+        'stages': project.project_type.stages.all(),
+        'filtered_pole': Pole.objects.filter(project=project, pk=filters['pole']).first() if filters['pole'] else None,
+        'archived_until': project.log_archives.aggregate(newest=Max('newest_at'))['newest'],
+    })
+
+@login_required
+def project_logs_feed(request, project_id):
+    """JSON variant of project_logs for infinite scroll; takes the same filters and cursor."""
+    project = get_object_or_404(Project, id=project_id)
+    check_project_access(request.user, project)  # <--- SECURITY CHECK
+
+    logs, next_cursor, _ = _project_log_page(request, project)
+    return JsonResponse({
+        'results': [{
+            'id': log.id,
+            'timestamp': log.timestamp.isoformat(),
+            'time_display': dateformat.format(timezone.localtime(log.timestamp), "M d, H:i"),
+            'user': log.user.username if log.user else None,
+            'action': log.action,
+            'target': log.target,
+            'details': log.details,
+            'gps_lat': log.gps_lat,
+            'gps_long': log.gps_long,
+            'data': log.payload,
+        } for log in logs],
+        'next': next_cursor,
+    })
 
 @login_required
 def export_project_logs(request, project_id):
     project = get_object_or_404(Project, id=project_id)
     check_project_access(request.user, project)  # <--- SECURITY CHECK
 
-    response = HttpResponse(content_type='text/csv')
+    # Streamed in chunks straight from a DB cursor: memory stays flat however
+    # long the log is, and the user join replaces a query per row. Entries
+    # moved out by archive_project_logs follow the live ones (they are older)
+    # and are read from the archives that overlap the date range.
+    matching, _ = _log_filters(request)
+    live = project.logs.matching(**matching).values_list(
+        'timestamp', 'user__username', 'action', 'target', 'details', 'gps_lat', 'gps_long', 'payload'
+    ).iterator(chunk_size=LOG_EXPORT_CHUNK_SIZE)
+    archived = (
+        (row['timestamp'], row['user'], row['action'], row['target'], row['details'], row['gps_lat'], row['gps_long'], row['payload'])
+        for row in iter_archived_logs(project, **matching)
+    )
+
+    def stream():
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(['Timestamp', 'User', 'Action', 'Target', 'Details', 'Latitude', 'Longitude', 'Data'])
+        for count, (timestamp, username, *columns, payload) in enumerate(chain(live, archived), 1):
+            writer.writerow([
+                timestamp.strftime("%Y-%m-%d %H:%M:%S"), username or "System/Client", *columns,
+                json.dumps(payload, ensure_ascii=False) if payload else "",
+            ])
+            if count % LOG_EXPORT_CHUNK_SIZE == 0:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+        yield buffer.getvalue()
+
+    response = StreamingHttpResponse(stream(), content_type='text/csv')
     filename = f"Project_Logs_{project.name}_{timezone.now().strftime('%Y%m%d')}.csv"
     response['Content-Disposition'] = f'attachment; filename="{filename}"'
-
-    writer = csv.writer(response)
-    writer.writerow(['Timestamp', 'User', 'Action', 'Target', 'Details', 'Latitude', 'Longitude'])
-
-    for log in project.logs.all():
-        writer.writerow([
-            log.timestamp.strftime("%Y-%m-%d %H:%M:%S"),
-            log.user.username if log.user else "System/Client",
-            log.action,
-            log.target,
-            log.details,
-            log.gps_lat,
-            log.gps_long
-        ])
-
     return response
 
 @login_required
@@ -160,49 +348,36 @@ def mark_project_completed(request, project_id):
 
 @login_required
 def create_project_item(request, project_id):
-    project = get_object_or_404(Project, id=project_id)
+    project = get_object_or_404(Project.objects.select_related('project_type'), id=project_id)
     check_project_access(request.user, project)  # <--- SECURITY CHECK
     
     if request.method == 'POST':
         form = DynamicItemForm(project, request.POST)
         if form.is_valid():
-            temp_id = f"TEMP-{project.poles.count() + 1}"
-            pole = Pole.objects.create(project=project, identifier=temp_id)
-            
-            # Collect custom data for the log
-            custom_data_log = []
-            
-            for field_def in project.field_definitions.all():
-                field_name = f"custom_{field_def.id}"
-                answer = form.cleaned_data.get(field_name)
-                ItemFieldValue.objects.create(pole=pole, field_def=field_def, value=answer)
-                custom_data_log.append(f"{field_def.label}: {answer}")
-            
-            # --- Identifier Logic ---
-            new_identifier = ""
-            group_def = project.field_definitions.filter(is_grouping_key=True).first()
-            if group_def:
-                val_obj = ItemFieldValue.objects.filter(pole=pole, field_def=group_def).first()
-                group_value = val_obj.value if val_obj else ""
-                if group_value:
-                    count = ItemFieldValue.objects.filter(field_def=group_def, value=group_value, pole__project=project).count()
-                    new_identifier = f"{project.name}_{group_value} #{count}"
-            
-            if not new_identifier:
-                new_identifier = f"{project.project_type.unit_name} #{project.poles.count()}"
+            group_def = next((fd for fd in form.field_defs if fd.is_grouping_key), None)
+            group_value = (form.cleaned_data.get(f"custom_{group_def.id}") or "") if group_def else ""
+
+            with transaction.atomic():
+                # --- Identifier Logic ---
+                number = PoleSequence.objects.allocate(project, group_value)
+                new_identifier = PoleSequence.format_identifier(project, group_value, number)
+                pole = Pole.objects.create(project=project, identifier=new_identifier)
+
+                # bulk_create skips the ItemFieldValue signals: creating the pole already bumped
+                # content_version, and the search document is rebuilt below
+                values = [
+                    ItemFieldValue(pole=pole, field_def=field_def, value=form.cleaned_data.get(f"custom_{field_def.id}"))
+                    for field_def in form.field_defs
+                ]
+                ItemFieldValue.objects.bulk_create(values)
+                PoleSearchDocument.objects.rebuild([pole.pk])
 
-            base = new_identifier
-            c = 1
-            while project.poles.filter(identifier=new_identifier).exclude(id=pole.id).exists():
-                new_identifier = f"{base}-{c}"
-                c += 1
-
-            pole.identifier = new_identifier
-            pole.save()
-            
             # --- LOGGING ---
-            log_details = " | ".join(custom_data_log)
-            log_action(project, request.user, "Created Item", pole.identifier, f"Custom Fields: {log_details}")
+            log_details = " | ".join(f"{value.field_def.label}: {value.value}" for value in values)
+            log_action(
+                project, request.user, "Created Item", pole.identifier, f"Custom Fields: {log_details}",
+                data={'pole_id': pole.pk, 'fields': {value.field_def.label: value.value for value in values}},
+            )
             
             messages.success(request, f"Created {new_identifier}!")
             return redirect('project_detail', project_id=project.id)
@@ -210,27 +385,52 @@ def create_project_item(request, project_id):
         form = DynamicItemForm(project)
     return render(request, 'tracker/add_item.html', {'project': project, 'form': form})
 
+@login_required
+def dropdown_typeahead(request, project_id, field_id):
+    """JSON suggestions for a DROPDOWN field too large to render as a <select>."""
+    project = get_object_or_404(Project, id=project_id)
+    check_project_access(request.user, project)
+    field_def = get_object_or_404(ItemFieldDefinition, id=field_id, project=project, field_type='DROPDOWN')
+
+    try:
+        limit = min(int(request.GET.get('limit', settings.DROPDOWN_TYPEAHEAD_LIMIT)), 50)
+    except ValueError:
+        limit = settings.DROPDOWN_TYPEAHEAD_LIMIT
+    results, truncated = search_dropdown_values(project, field_def.excel_column, request.GET.get('q', ''), max(limit, 1))
+    return JsonResponse({'results': results, 'truncated': truncated})
+
 # ==========================================
 # 3. POLE / EVIDENCE HANDLING
 # ==========================================
 
+def _pole_stages(pole):
+    """
+    The pole's stages in order, each marked is_done, is_locked (an earlier
+    stage has no photo, or only a FAILED one) and upload_failed, plus its
+    evidence by stage id, whatever its status. Two queries however
+    many stages the project type has; pole_detail uses the same result to
+    render the page and to refuse uploads that skip a stage.
+    """
+    evidence_map = {evidence.stage_id: evidence for evidence in pole.evidence.all()}
+    stages = list(pole.project.project_type.stages.order_by('order'))
+    earlier_done = True
+    for stage in stages:
+        # A photo still PROCESSING unlocks the next stage, so work on site can go
+        # on while it is handled; a FAILED one has to be uploaded again first
+        evidence = evidence_map.get(stage.id)
+        stage.is_done = evidence is not None and evidence.status != 'FAILED'
+        stage.upload_failed = evidence is not None and evidence.status == 'FAILED'
+        stage.is_locked = not earlier_done
+        earlier_done = earlier_done and stage.is_done
+    return stages, evidence_map
+
 @login_required
 def pole_detail(request, pole_id):
-    pole = get_object_or_404(Pole, id=pole_id)
+    pole = get_object_or_404(Pole.objects.select_related('project__project_type'), id=pole_id)
     check_project_access(request.user, pole.project)  # <--- SECURITY CHECK
-    
-    stages = pole.project.project_type.stages.all().order_by('order')
-    existing_evidence = Evidence.objects.filter(pole=pole)
-    evidence_map = {e.stage.id: e for e in existing_evidence}
 
     # --- 1. CALCULATE LOCK STATUS ---
-    previous_stage_done = True 
-    for stage in stages:
-        stage.is_locked = not previous_stage_done
-        if stage.id in evidence_map:
-            previous_stage_done = True
-        else:
-            previous_stage_done = False
+    stages, evidence_map = _pole_stages(pole)
 
     if request.method == 'POST':
         # [FIX] SECURITY: Validate inputs immediately
@@ -249,80 +449,50 @@ def pole_detail(request, pole_id):
         raw_file = request.FILES.get('image')
 
         # --- 2. SECURITY CHECK: PREVENT SKIPPING ---
-        if stage_id:
-            target_stage = get_object_or_404(StageDefinition, id=stage_id)
-            
-            # Find all stages that come BEFORE this one
-            prev_stages = StageDefinition.objects.filter(
-                project_type=pole.project.project_type,
-                order__lt=target_stage.order
-            )
-            
-            missing_stages = []
-            for ps in prev_stages:
-                if not Evidence.objects.filter(pole=pole, stage=ps).exists():
-                    missing_stages.append(ps.name)
-            
-            if missing_stages:
-                messages.error(request, f"⛔ Sequence Locked! You must complete: {', '.join(missing_stages)} first.")
-                return redirect('pole_detail', pole_id=pole.id)
-
-        # (Existing Deletion Logic)
-        if stage_id:
-            stage_obj = get_object_or_404(StageDefinition, id=stage_id)
-            if Evidence.objects.filter(pole=pole, stage=stage_obj).exists():
-                Evidence.objects.filter(pole=pole, stage=stage_obj).delete()
-                log_action(pole.project, request.user, "Re-Uploaded Evidence", pole.identifier, f"Overwrote stage: {stage_obj.name}")
+        # Only this project type's stages, checked against the set loaded above
+        stage_obj = next((stage for stage in stages if stage.id == stage_id), None)
+        if stage_obj is None:
+            messages.error(request, "Invalid Stage ID.")
+            return redirect('pole_detail', pole_id=pole.id)
+        if stage_obj.is_locked:
+            missing_stages = [stage.name for stage in stages[:stages.index(stage_obj)] if not stage.is_done]
+            messages.error(request, f"⛔ Sequence Locked! You must complete: {', '.join(missing_stages)} first.")
+            return redirect('pole_detail', pole_id=pole.id)
 
         form = EvidenceForm(request.POST, request.FILES)
 
         if form.is_valid():
             try:
-                evidence = form.save(commit=False)
-                evidence.pole = pole
-                if stage_id:
+                # The old photo is only replaced once the new one is valid, and
+                # both happen in one transaction with the queued job
+                with transaction.atomic():
+                    previous = evidence_map.get(stage_obj.id)
+                    if previous:
+                        previous.delete()
+                        log_action(
+                            pole.project, request.user, "Re-Uploaded Evidence", pole.identifier, f"Overwrote stage: {stage_obj.name}",
+                            data={'pole_id': pole.pk, 'stage_id': stage_obj.pk},
+                        )
+
+                    evidence = form.save(commit=False)
+                    evidence.pole = pole
                     evidence.stage = stage_obj
 
-                # EXIF Fallback
-                if (not lat or not lon) and raw_file:
-                    try:
-                        if hasattr(raw_file, 'seek'): raw_file.seek(0)
-                        exif_lat, exif_lon = get_gps_from_image(raw_file)
-                        if exif_lat and exif_lon:
-                            lat, lon = exif_lat, exif_lon
-                    except Exception as e:
-                        logger.warning(f"EXIF Extraction Failed: {e}")
-
-                if lat and lon:
-                    evidence.gps_lat = lat
-                    evidence.gps_long = lon
-
-                # Watermarking
-                if raw_file:
-                    try:
-                        if hasattr(raw_file, 'seek'): raw_file.seek(0)
-                        branded_content = watermark_image(raw_file, lat, lon)
-                        branded_file = InMemoryUploadedFile(
-                            file=branded_content, field_name=None, name=raw_file.name,
-                            content_type='image/jpeg', size=branded_content.tell(), charset=None
-                        )
-                        evidence.image = branded_file
-                    except Exception as e:
-                        logger.error(f"Watermarking Failed: {e}")
-
-                evidence.save() 
-                
-                log_action(
-                    pole.project, request.user, "Uploaded Evidence", pole.identifier, 
-                    f"Stage: {evidence.stage.name}", lat=lat, lon=lon
-                )
-
-                required_count = StageDefinition.objects.filter(project_type=pole.project.project_type, is_required=True).count()
-                uploaded_count = Evidence.objects.filter(pole=pole, stage__is_required=True).values('stage').distinct().count()
-                pole.is_completed = (uploaded_count >= required_count)
-                pole.save()
-
-                messages.success(request, "Upload successful!")
+                    if lat and lon:
+                        evidence.gps_lat = lat
+                        evidence.gps_long = lon
+
+                    # EXIF fallback, watermarking and the storage upload run in the
+                    # evidence worker (tracker/jobs.py) so the contractor is not kept waiting
+                    enqueue_evidence(evidence, raw_file)
+
+                    log_action(
+                        pole.project, request.user, "Uploaded Evidence", pole.identifier,
+                        f"Stage: {stage_obj.name}", lat=lat, lon=lon,
+                        data={'pole_id': pole.pk, 'stage_id': stage_obj.pk, 'evidence_id': evidence.pk},
+                    )
+
+                messages.success(request, "Photo received! It will appear once processing finishes.")
                 return redirect('pole_detail', pole_id=pole.id)
             except Exception as e:
                 logger.error(f"Upload Error: {e}")
@@ -342,17 +512,16 @@ def delete_evidence(request, evidence_id):
     
     pole = evidence.pole
     stage_name = evidence.stage.name
+    stage_id = evidence.stage_id
     
     if request.user.is_authenticated:
         evidence.delete()
         
         # --- LOGGING ---
-        log_action(pole.project, request.user, "Deleted Evidence", pole.identifier, f"Deleted photo for: {stage_name}")
-        
-        required_count = StageDefinition.objects.filter(project_type=pole.project.project_type, is_required=True).count()
-        uploaded_count = Evidence.objects.filter(pole=pole, stage__is_required=True).values('stage').distinct().count()
-        pole.is_completed = (uploaded_count >= required_count)
-        pole.save()
+        log_action(
+            pole.project, request.user, "Deleted Evidence", pole.identifier, f"Deleted photo for: {stage_name}",
+            data={'pole_id': pole.pk, 'stage_id': stage_id},
+        )
         
     return redirect('pole_detail', pole_id=pole.id)
 
@@ -370,74 +539,84 @@ def admin_project_inspection(request, project_id):
 # ==========================================
 # 4. CLIENT / ISSUE VIEWS
 # ==========================================
-@rate_limit(limit=10, period=60)
-def client_dashboard(request, client_uuid):
-    client_org = get_object_or_404(Client, uuid=client_uuid)
-    projects = client_org.projects.all().order_by('-created_at')
-    
-    total_poles = 0
-    completed_poles = 0
-    for p in projects:
-        total_poles += p.poles.count()
-        completed_poles += p.poles.filter(is_completed=True).count()
+def _client_dashboard_context(client_org, projects):
+    projects = list(projects.with_stats())
+    total_poles = sum(p.pole_total for p in projects)
+    completed_poles = sum(p.pole_done for p in projects)
     overall_progress = int((completed_poles/total_poles)*100) if total_poles > 0 else 0
-    return render(request, 'tracker/client_dashboard.html', {
+    return {
         'client': client_org,
         'projects': projects,
         'overall_progress': overall_progress
-    })
+    }
 
-@rate_limit(limit=60, period=60)
-def client_city_view(request, client_uuid):
-    project = get_object_or_404(Project, client_uuid=client_uuid)
-    # NOTE: We will secure this with a PIN in the next step
+@rate_limit(limit=10, period=60)
+def client_dashboard(request, client_uuid):
+    client_org = get_object_or_404(Client, uuid=client_uuid)
+    projects = client_org.projects.order_by('-created_at')
     
-    poles = project.poles.all()
-    total = poles.count()
-    done = poles.filter(is_completed=True).count()
+    # The key covers every listed project's version (bumped when the client or a
+    # project type changes too), so adding, removing or editing any city
+    # re-renders the page; the name covers a client without projects.
+    versions = hashlib.md5(repr((client_org.name, list(projects.values_list('id', 'content_version')))).encode()).hexdigest()
+    page_content = render_cached_fragment(
+        f"client_dashboard:{client_uuid}:{versions}", 'tracker/partials/client_dashboard_body.html',
+        lambda: _client_dashboard_context(client_org, projects),
+    )
+    return render(request, 'tracker/client_dashboard.html', {'client': client_org, 'page_content': page_content})
+
+def _client_city_context(project):
+    # Fixed query count regardless of size: poles (with the open-issue flag),
+    # then one prefetch each for evidence and custom values. Grouping is in memory.
+    open_issues = ProjectIssue.objects.filter(pole=OuterRef('pk'), status='OPEN')
+    poles = list(project.poles.annotate(open_issue_flag=Exists(open_issues)).prefetch_related(
+        Prefetch('evidence', queryset=Evidence.objects.filter(status='READY').select_related('stage').order_by('stage__order'), to_attr='history'),
+        Prefetch('custom_values', queryset=ItemFieldValue.objects.select_related('field_def').order_by('id'), to_attr='custom_data'),
+    ).order_by('id'))
+    total = len(poles)
+    done = sum(1 for pole in poles if pole.is_completed)
     progress = int((done/total)*100) if total > 0 else 0
     
     group_def = project.field_definitions.filter(is_grouping_key=True).first()
     grouped_data = {}
     
-    if group_def:
-        for pole in poles:
-            val_obj = pole.custom_values.filter(field_def=group_def).first()
-            village_name = val_obj.value if (val_obj and val_obj.value) else "General"
-            if village_name not in grouped_data:
-                grouped_data[village_name] = {'poles': [], 'done': 0, 'total': 0}
-            history = pole.evidence.all().order_by('stage__order')
-            custom_data = pole.custom_values.select_related('field_def').all()
-            has_issue = pole.issues.filter(status='OPEN').exists()
-            grouped_data[village_name]['poles'].append({
-                'pole': pole,
-                'history': history,
-                'has_issue': has_issue,
-                'custom_data': custom_data
-            })
-            grouped_data[village_name]['total'] += 1
-            if pole.is_completed:
-                grouped_data[village_name]['done'] += 1
-        for v_name, data in grouped_data.items():
-            data['percent'] = int((data['done'] / data['total']) * 100) if data['total'] > 0 else 0
-        grouped_data = dict(sorted(grouped_data.items()))
-    else:
-        grouped_data['All Locations'] = {'poles': [], 'done': done, 'total': total, 'percent': progress}
-        for pole in poles:
-            history = pole.evidence.all().order_by('stage__order')
-            custom_data = pole.custom_values.select_related('field_def').all()
-            has_issue = pole.issues.filter(status='OPEN').exists()
-            grouped_data['All Locations']['poles'].append({
-                'pole': pole, 
-                'history': history,
-                'has_issue': has_issue,
-                'custom_data': custom_data
-            })
-    return render(request, 'tracker/client_city_view.html', {
+    for pole in poles:
+        village_name = "All Locations"
+        if group_def:
+            village_name = next((v.value for v in pole.custom_data if v.field_def_id == group_def.id and v.value), "General")
+        if village_name not in grouped_data:
+            grouped_data[village_name] = {'poles': [], 'done': 0, 'total': 0}
+        grouped_data[village_name]['poles'].append({
+            'pole': pole,
+            'history': pole.history,
+            'has_issue': pole.open_issue_flag,
+            'custom_data': pole.custom_data
+        })
+        grouped_data[village_name]['total'] += 1
+        if pole.is_completed:
+            grouped_data[village_name]['done'] += 1
+
+    if not group_def and not grouped_data:
+        grouped_data['All Locations'] = {'poles': [], 'done': 0, 'total': 0}
+    for v_name, data in grouped_data.items():
+        data['percent'] = int((data['done'] / data['total']) * 100) if data['total'] > 0 else 0
+    grouped_data = dict(sorted(grouped_data.items()))
+    return {
         'project': project,
         'grouped_data': grouped_data,
         'progress': progress
-    })
+    }
+
+@rate_limit(limit=60, period=60)
+def client_city_view(request, client_uuid):
+    project = get_object_or_404(Project, client_uuid=client_uuid)
+    # NOTE: We will secure this with a PIN in the next step
+    
+    page_content = render_cached_fragment(
+        f"client_city:{client_uuid}:{project.content_version}", 'tracker/partials/client_city_view_body.html',
+        lambda: _client_city_context(project),
+    )
+    return render(request, 'tracker/client_city_view.html', {'project': project, 'page_content': page_content})
 
 @rate_limit(limit=5, period=300) # Strict limit: 5 reports per 5 mins
 def report_issue(request, pole_id):
@@ -451,13 +630,16 @@ def report_issue(request, pole_id):
     if request.method == 'POST':
         form = IssueForm(request.POST)
         if form.is_valid():
-            ProjectIssue.objects.create(
+            issue = ProjectIssue.objects.create(
                 pole=pole,
                 message=form.cleaned_data['message']
             )
             # --- LOGGING ---
             # User is None because this comes from the Client (Magic Link)
-            log_action(pole.project, None, "Client Flagged Issue", pole.identifier, f"Issue: {form.cleaned_data['message']}")
+            log_action(
+                pole.project, None, "Client Flagged Issue", pole.identifier, f"Issue: {form.cleaned_data['message']}",
+                data={'pole_id': pole.pk, 'issue_id': issue.pk},
+            )
             
             messages.success(request, "Issue reported to the admin.")
     return redirect('client_view', client_uuid=pole.project.client_uuid)
@@ -478,7 +660,10 @@ def resolve_issue(request, issue_id):
     issue.status = 'RESOLVED'
     issue.save()
     
-    log_action(issue.pole.project, request.user, "Resolved Issue", issue.pole.identifier, f"Resolved report from {issue.reported_by}")
+    log_action(
+        issue.pole.project, request.user, "Resolved Issue", issue.pole.identifier, f"Resolved report from {issue.reported_by}",
+        data={'pole_id': issue.pole_id, 'issue_id': issue.pk},
+    )
     
     messages.success(request, "Issue marked as resolved.")
     return redirect('project_issues', project_id=issue.pole.project.id)